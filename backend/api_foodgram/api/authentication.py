@@ -0,0 +1,98 @@
+import pickle
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from api.versions import auth_version_name, get_version
+
+TOKEN_KEY = 'auth-token:{}'
+
+
+class LRUCache:
+    """Ограниченный по числу записей словарь, вытесняющий самые старые."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+def token_digest(key):
+    return sha256(key.encode()).hexdigest()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к БД на каждый вызов API.
+
+    Пара (пользователь, токен) хранится в LRU процесса и в общем кеше
+    вместе с версией токена. Сигналы меняют версию при удалении токена,
+    смене пароля и деактивации пользователя, и запись из любого процесса
+    перестаёт приниматься. В LRU запись лежит сериализованной, чтобы
+    запросы не делили один изменяемый объект пользователя. Источник и
+    время проверки токена сохраняются в request.auth_source и
+    request.auth_duration_ms. Без общего кеша (SHARED_CACHE) токен
+    проверяется по БД.
+    """
+    tokens = LRUCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+    def authenticate(self, request):
+        started = perf_counter()
+        self.source = None
+        try:
+            return super().authenticate(request)
+        finally:
+            if self.source is not None:
+                http_request = request._request
+                http_request.auth_source = self.source
+                http_request.auth_duration_ms = (
+                    perf_counter() - started) * 1000
+
+    def authenticate_credentials(self, key):
+        if not settings.SHARED_CACHE:
+            self.source = 'db'
+            return super().authenticate_credentials(key)
+        digest = token_digest(key)
+        # Версия читается до запроса к БД: изменение, сделанное позже,
+        # сменит её, и сохранённая запись не будет принята.
+        version = get_version(auth_version_name(digest))
+        self.source = 'memory'
+        entry = self.tokens.get(digest)
+        if entry is None:
+            self.source = 'cache'
+            entry = cache.get(TOKEN_KEY.format(digest))
+        if entry is not None:
+            user, token, entry_version = pickle.loads(entry)
+            if entry_version == version:
+                self.tokens.set(digest, entry)
+                return user, token
+        self.source = 'db'
+        user, token = super().authenticate_credentials(key)
+        entry = pickle.dumps((user, token, version))
+        self.tokens.set(digest, entry)
+        cache.set(
+            TOKEN_KEY.format(digest), entry, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        return user, token
@@ -0,0 +1,46 @@
+import math
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure(func, repeat, setup=None):
+    """
+    Время (мс) и число SQL-запросов для каждого из repeat вызовов.
+
+    setup вызывается перед каждым вызовом и в замер не входит.
+    """
+    timings, queries = [], []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(context.captured_queries))
+    return timings, queries
+
+
+def summarize(timings, queries):
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries': max(queries),
+    }
+
+
+def read_response(response):
+    """Полностью вычитывает ответ, в том числе потоковый."""
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
@@ -0,0 +1,86 @@
+from hashlib import sha1
+from typing import NamedTuple, Tuple
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from api.metrics import RESPONSE_CACHE
+from api.versions import get_version, user_version_name
+
+RESPONSE_KEY = 'response:{}'
+STATS_KEY = 'cache-stats:{}:{}'
+HIT = 'hit'
+MISS = 'miss'
+
+RECIPES_CACHE_TIMEOUT = 5 * 60
+SUBSCRIPTIONS_CACHE_TIMEOUT = 30
+FEED_CACHE_TIMEOUT = 30
+
+
+class CachePolicy(NamedTuple):
+    """
+    Правила кеширования ответа одного действия вьюсета.
+
+    versions — наборы данных, от которых зависит ответ: сигналы моделей
+    меняют их версии, и старые ключи больше не используются. Если
+    per_user, в ключ входят id и версия данных пользователя, а анонимы
+    получают общий ответ. timeout = 0 — только ETag, без хранения ответа.
+    """
+    versions: Tuple[str, ...] = ()
+    per_user: bool = False
+    timeout: int = 0
+
+
+def response_fingerprint(request, policy):
+    parts = [request.get_full_path(), request.accepted_media_type]
+    parts.extend(get_version(name) for name in policy.versions)
+    if policy.per_user and request.user.is_authenticated:
+        parts.append(str(request.user.pk))
+        parts.append(get_version(user_version_name(request.user.pk)))
+    return sha1('\n'.join(parts).encode()).hexdigest()
+
+
+def get_cached_response(fingerprint):
+    cached = cache.get(RESPONSE_KEY.format(fingerprint))
+    if cached is None:
+        return None
+    content, content_type = cached
+    return HttpResponse(content, content_type=content_type)
+
+
+def store_response(fingerprint, response, timeout):
+    """Сохраняет ответ, когда он будет отрендерен."""
+    def store(response):
+        cache.set(
+            RESPONSE_KEY.format(fingerprint),
+            (response.content, response['Content-Type']),
+            timeout,
+        )
+
+    if getattr(response, 'is_rendered', True):
+        store(response)
+    else:
+        response.add_post_render_callback(store)
+
+
+def record(name, outcome):
+    """Счётчики попаданий и промахов в общем кеше, по вьюсету и действию."""
+    RESPONSE_CACHE.labels(name, outcome).inc()
+    key = STATS_KEY.format(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def cache_stats(names):
+    keys = {
+        STATS_KEY.format(name, outcome): (name, outcome)
+        for name in names for outcome in (HIT, MISS)
+    }
+    stats = {name: {HIT: 0, MISS: 0} for name in names}
+    for key, value in cache.get_many(keys).items():
+        name, outcome = keys[key]
+        stats[name][outcome] = value
+    return stats
@@ -0,0 +1,102 @@
+from bisect import bisect_left
+from threading import Lock
+
+from rest_framework.renderers import JSONRenderer
+
+from api.serializers import IngredientSerializer, TagSerializer
+from api.versions import INGREDIENTS_VERSION, TAGS_VERSION, get_version
+from recipes.models import Ingredient, Tag
+
+
+class IngredientIndex:
+    """
+    Индекс названий ингредиентов в памяти процесса.
+
+    Хранит пары (название в нижнем регистре, id), отсортированные по
+    названию: совпадения по началу строки ищутся бинарным поиском,
+    по подстроке — проходом по списку.
+    """
+
+    def __init__(self, rows):
+        self._names = sorted((name.casefold(), pk) for pk, name in rows)
+
+    def search(self, term, limit):
+        """Id совпадений по началу названия и по подстроке, не больше limit."""
+        term = term.casefold()
+        prefix = []
+        start = bisect_left(self._names, (term,))
+        for name, pk in self._names[start:start + limit]:
+            if not name.startswith(term):
+                break
+            prefix.append(pk)
+        substring = []
+        for name, pk in self._names:
+            if len(prefix) + len(substring) == limit:
+                break
+            if term in name and not name.startswith(term):
+                substring.append(pk)
+        return prefix, substring
+
+
+class Snapshot:
+    """Неизменяемый снимок справочника с готовым JSON."""
+
+    def __init__(self, version, data):
+        renderer = JSONRenderer()
+        self.version = version
+        self.items = {item['id']: renderer.render(item) for item in data}
+        self.list_json = self.join(self.items)
+
+    def join(self, ids):
+        """JSON-массив объектов ids; отсутствующие в снимке пропускаются."""
+        return b'[' + b','.join(
+            self.items[pk] for pk in ids if pk in self.items) + b']'
+
+
+class IngredientSnapshot(Snapshot):
+
+    def __init__(self, version, data):
+        super().__init__(version, data)
+        self.index = IngredientIndex(
+            (item['id'], item['name']) for item in data)
+
+
+class Catalog:
+    """
+    Справочник, загружаемый в память один раз на процесс.
+
+    Снимок пересобирается, когда меняется версия справочника в общем кеше;
+    версию меняют сигналы сохранения и удаления моделей.
+    """
+
+    def __init__(self, name, queryset, serializer_class,
+                 snapshot_class=Snapshot):
+        self.name = name
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.snapshot_class = snapshot_class
+        self._snapshot = None
+        self._lock = Lock()
+
+    def get(self):
+        version = get_version(self.name)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                data = self.serializer_class(
+                    self.queryset.all(), many=True).data
+                snapshot = self.snapshot_class(version, data)
+                self._snapshot = snapshot
+        return snapshot
+
+
+tag_catalog = Catalog(TAGS_VERSION, Tag.objects.all(), TagSerializer)
+ingredient_catalog = Catalog(
+    INGREDIENTS_VERSION,
+    Ingredient.objects.all(),
+    IngredientSerializer,
+    snapshot_class=IngredientSnapshot,
+)
@@ -1,6 +1,17 @@
+import base64
+import binascii
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
 from rest_framework import serializers
 
 import webcolors
+from recipes.images import VARIANTS
 
 
 class Hex2NameColor(serializers.Field):
@@ -13,3 +24,150 @@ class Hex2NameColor(serializers.Field):
         except ValueError:
             raise serializers.ValidationError('Для этого цвета нет имени')
         return data
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Ссылки на уменьшенные копии картинки рецепта.
+
+    Пока копии не готовы, вместо них отдаётся ссылка на оригинал.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        request = self.context.get('request')
+        urls = {}
+        for name in VARIANTS:
+            path = recipe.image_variants.get(name)
+            url = default_storage.url(path) if path else recipe.image.url
+            urls[name] = (
+                request.build_absolute_uri(url) if request is not None
+                else url
+            )
+        return urls
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """
+    Картинка в base64, которая декодируется по частям во временный файл.
+
+    Слишком длинные строки отклоняются до декодирования, формат
+    определяется по первым байтам, а размеры картинки проверяются
+    по заголовку, до того как Pillow развернёт её в память.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    LINE_LENGTH = 76
+    HEADER_LENGTH = 64
+    SPOOL_SIZE = 1024 * 1024
+    SIGNATURES = {
+        b'\xff\xd8\xff': 'jpg',
+        b'\x89PNG\r\n\x1a\n': 'png',
+        b'GIF87a': 'gif',
+        b'GIF89a': 'gif',
+    }
+    PIL_FORMATS = {'jpg': 'JPEG', 'png': 'PNG', 'gif': 'GIF'}
+    INVALID_FILE_MESSAGE = 'Загрузите корректную картинку'
+    INVALID_TYPE_MESSAGE = 'Поддерживаются только JPEG, PNG и GIF'
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        if len(base64_data) > self.max_encoded_length():
+            raise self.too_large()
+        if ';base64,' in base64_data:
+            base64_data = base64_data.split(';base64,', 1)[1]
+        file = SpooledTemporaryFile(max_size=self.SPOOL_SIZE)
+        try:
+            extension = self.decode(base64_data, file)
+            self.check_image(file, extension)
+        except serializers.ValidationError:
+            file.close()
+            raise
+        data = UploadedFile(
+            file=file,
+            name='{}.{}'.format(uuid.uuid4(), extension),
+            content_type='image/{}'.format(
+                self.PIL_FORMATS[extension].lower()),
+            size=file.tell(),
+        )
+        file.seek(0)
+        return serializers.FileField.to_internal_value(self, data)
+
+    def max_encoded_length(self):
+        """
+        Наибольшая длина строки с картинкой RECIPE_IMAGE_MAX_SIZE байт.
+
+        Кодировщики MIME и base64 без -w0 переносят строки каждые
+        76 символов, на перенос отводится два символа (CRLF).
+        """
+        encoded = -(-settings.RECIPE_IMAGE_MAX_SIZE // 3) * 4
+        return (encoded + -(-encoded // self.LINE_LENGTH) * 2
+                + self.HEADER_LENGTH)
+
+    def too_large(self):
+        return serializers.ValidationError(
+            'Картинка больше {} байт'.format(settings.RECIPE_IMAGE_MAX_SIZE)
+        )
+
+    def decode(self, base64_data, file):
+        """
+        Пишет декодированные байты в file и возвращает расширение.
+
+        Пробельные символы убираются из каждой части отдельно, а остаток
+        части, не кратный четырём символам, переносится в следующую.
+        """
+        step = self.CHUNK_SIZE * 4
+        extension = None
+        pending = ''
+        for start in range(0, len(base64_data), step):
+            pending += ''.join(base64_data[start:start + step].split())
+            usable = len(pending) // 4 * 4
+            if not usable:
+                continue
+            chunk = self.decode_chunk(pending[:usable])
+            pending = pending[usable:]
+            if extension is None:
+                extension = self.get_format(chunk)
+            file.write(chunk)
+            if file.tell() > settings.RECIPE_IMAGE_MAX_SIZE:
+                raise self.too_large()
+        if pending:
+            self.decode_chunk(pending)
+        if extension is None:
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        return extension
+
+    def decode_chunk(self, chunk):
+        try:
+            return base64.b64decode(chunk, validate=True)
+        except (binascii.Error, ValueError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+
+    def get_format(self, header):
+        for signature, extension in self.SIGNATURES.items():
+            if header.startswith(signature):
+                return extension
+        raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+
+    def check_image(self, file, extension):
+        max_side = settings.RECIPE_IMAGE_MAX_SIDE
+        try:
+            file.seek(0)
+            image = Image.open(file)
+            if image.format != self.PIL_FORMATS[extension]:
+                raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+            if max(image.size) > max_side:
+                raise serializers.ValidationError(
+                    'Картинка больше {0}x{0} пикселей'.format(max_side)
+                )
+            image.verify()
+        except (OSError, SyntaxError, ValueError,
+                Image.DecompressionBombError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        file.seek(0, 2)
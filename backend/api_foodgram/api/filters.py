@@ -1,46 +1,93 @@
-from django_filters import AllValuesMultipleFilter
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from api.search import search_ingredients
+from recipes.models import (FavoriteRecipeUser, Ingredient, Recipe, RecipeTag,
+                            ShoppingCartUser, Tag,)
+
+User = get_user_model()
+
+# Оценки пересчитывает команда update_recipe_scores, при запросе
+# избранное и списки покупок не агрегируются.
+RECIPE_ORDERINGS = {
+    'popular': ('-popularity_score', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
 
 
 class CustomRecipeFilterSet(filters.FilterSet):
+    """
+    Фильтры рецептов без JOIN и DISTINCT.
+
+    Теги, избранное и список покупок проверяются подзапросами по
+    уникальным индексам (tag, recipe) и (user, recipe), а id авторов
+    сверяются только с таблицей пользователей.
+    """
     tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
         to_field_name='slug',
         label='tags',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        method='filter_tags',
+    )
+    author = filters.ModelMultipleChoiceFilter(
+        queryset=User.objects.all(),
+        method='filter_author',
     )
-    author = AllValuesMultipleFilter(field_name='author__id')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='filter_ordering',
+    )
 
-    def _bool_filter(self, key, value, queryset, user):
+    def filter_tags(self, queryset, name, tags):
+        if not tags:
+            return queryset
+        return queryset.filter(pk__in=RecipeTag.objects.filter(
+            tag__in=tags).values('recipe'))
+
+    def filter_author(self, queryset, name, authors):
+        if not authors:
+            return queryset
+        return queryset.filter(author__in=authors)
+
+    def _bool_filter(self, model, value, queryset, user):
         """Фильтрация для логических ключей."""
-        map_dict = {f'{key}__user': user}
-        if not user.is_anonymous:
-            if value is True:
-                return queryset.filter(**map_dict)
-            return queryset.exclude(**map_dict)
-        return queryset
+        if user.is_anonymous:
+            return queryset
+        exists = Exists(model.objects.filter(user=user, recipe=OuterRef('pk')))
+        return queryset.filter(exists if value else ~exists)
 
     def filter_is_favorited(self, queryset, name, value):
-        key = 'favorite_recipes'
-        return self._bool_filter(key, value, queryset, user=self.request.user)
+        return self._bool_filter(
+            FavoriteRecipeUser, value, queryset, user=self.request.user)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        key = 'recipe_in_shoplist'
-        return self._bool_filter(key, value, queryset, user=self.request.user)
+        return self._bool_filter(
+            ShoppingCartUser, value, queryset, user=self.request.user)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
 
     class Meta:
         model = Recipe
-        fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
+        fields = [
+            'tags',
+            'author',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'ordering',
+        ]
 
 
 class IngredientSearchFilter(filters.FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
+
+    def filter_name(self, queryset, name, value):
+        return search_ingredients(queryset, value)
 
     class Meta:
         model = Ingredient
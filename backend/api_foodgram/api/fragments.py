@@ -0,0 +1,83 @@
+from hashlib import sha1
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Prefetch, Value
+
+from api.versions import (INGREDIENTS_VERSION, TAGS_VERSION, get_versions,
+                          profile_version_name, recipe_version_name,)
+from recipes.models import Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+FRAGMENT_KEY = 'recipe-fragment:{}'
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+
+def fragment_queryset():
+    """
+    Рецепты для сборки фрагментов.
+
+    Флаги пользователя во фрагмент не входят, поэтому вместо них заглушки.
+    """
+    return Recipe.objects.annotate(
+        is_favorited=Value(False),
+        is_in_shopping_cart=Value(False),
+    ).prefetch_related(
+        Prefetch(
+            'author',
+            queryset=User.objects.annotate(is_subscribed=Value(False)),
+        ),
+        Prefetch('tags', queryset=Tag.objects.all()),
+        Prefetch(
+            'ingredient_in_recipe',
+            queryset=RecipeIngredient.objects.select_related('ingredient'),
+        ),
+    )
+
+
+def fragment_keys(recipes, request):
+    """
+    Ключи фрагментов рецептов, одним обращением к кешу за версиями.
+
+    В ключ входят версии рецепта, его автора и справочников тегов и
+    ингредиентов, а также адрес сайта: ссылки на картинки абсолютные.
+    """
+    names = {TAGS_VERSION, INGREDIENTS_VERSION}
+    for recipe in recipes:
+        names.add(recipe_version_name(recipe.pk))
+        names.add(profile_version_name(recipe.author_id))
+    versions = get_versions(names)
+    common = [
+        request.build_absolute_uri('/') if request is not None else '',
+        versions[TAGS_VERSION],
+        versions[INGREDIENTS_VERSION],
+    ]
+    keys = {}
+    for recipe in recipes:
+        parts = common + [
+            str(recipe.pk),
+            versions[recipe_version_name(recipe.pk)],
+            versions[profile_version_name(recipe.author_id)],
+        ]
+        keys[recipe.pk] = FRAGMENT_KEY.format(
+            sha1('\n'.join(parts).encode()).hexdigest())
+    return keys
+
+
+def get_fragments(keys):
+    """Найденные в кеше фрагменты по id рецепта."""
+    if not settings.SHARED_CACHE:
+        return {}
+    cached = cache.get_many(keys.values())
+    return {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+
+def set_fragments(keys, fragments):
+    if not settings.SHARED_CACHE:
+        return
+    cache.set_many(
+        {keys[pk]: fragment for pk, fragment in fragments.items()},
+        FRAGMENT_TIMEOUT,
+    )
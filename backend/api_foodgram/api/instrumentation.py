@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.dispatch import Signal
+from rest_framework import serializers
+
+current_metrics = ContextVar('current_metrics', default=None)
+# Запас к измеренному числу запросов действия: один запрос, например
+# SAVEPOINT или запрос версии, который тесты могут не застать. Больший
+# запас скрыл бы новый N+1 на маленьких данных тестов.
+QUERY_BUDGET_MARGIN = 1
+
+# Отправляется после ответа, в котором действие превысило бюджет запросов,
+# с аргументами metrics и request. Запрос к этому моменту уже выполнен,
+# поэтому ответ не меняется: тесты и бенчмарки собирают превышения сами.
+query_budget_exceeded = Signal()
+
+
+@contextmanager
+def collect_budget_violations():
+    """Описания превышений бюджета запросов, пока открыт контекст."""
+    violations = []
+
+    def receiver(sender, metrics, request, **kwargs):
+        violations.append(
+            f'{request.method} {request.path} ({metrics.view}): '
+            f'{metrics.queries} запросов к БД при бюджете {metrics.budget}'
+        )
+
+    query_budget_exceeded.connect(receiver)
+    try:
+        yield violations
+    finally:
+        query_budget_exceeded.disconnect(receiver)
+
+
+class RequestMetrics:
+    """Счётчики одного запроса: SQL-запросы, время БД и сериализации."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.view = None
+        self.budget = None
+        self.queries = 0
+        self.db_ms = 0.0
+        self.serializer_ms = 0.0
+        self._serializer_depth = 0
+
+    @property
+    def total_ms(self):
+        return (perf_counter() - self.started) * 1000
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper."""
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_ms += (perf_counter() - started) * 1000
+
+    @contextmanager
+    def serializing(self):
+        """Время сериализации без повторного учёта вложенных вызовов."""
+        self._serializer_depth += 1
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self._serializer_depth -= 1
+            if not self._serializer_depth:
+                self.serializer_ms += (perf_counter() - started) * 1000
+
+
+class TimedSerializerMixin:
+    """Добавляет время вычисления serializer.data к метрикам запроса."""
+
+    @property
+    def data(self):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().data
+        with metrics.serializing():
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
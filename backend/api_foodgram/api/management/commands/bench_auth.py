@@ -0,0 +1,94 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+
+from api.benchmarks import percentile
+
+User = get_user_model()
+
+LOGIN_URL = '/api/auth/token/login/'
+SET_PASSWORD_URL = '/api/users/set_password/'
+PASSWORDS = ('Bench-pass-1a!', 'Bench-pass-2b!')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет вход и смену пароля при параллельных запросах, '
+            'чтобы подобрать число воркеров под выбранный хешер. '
+            'Созданные пользователи удаляются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', nargs='+', type=int, default=[1, 4, 8])
+        parser.add_argument('--requests', type=int, default=10,
+                            help='Запросов на один поток, округляется до '
+                                 'чётного, чтобы пароль вернулся к исходному.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'hasher={get_hasher().algorithm}')
+        requests = options['requests'] + options['requests'] % 2
+        users = [
+            User.objects.create_user(
+                username=f'bench_auth_{number}',
+                email=f'bench_auth_{number}@example.com',
+                password=PASSWORDS[0],
+            )
+            for number in range(max(options['concurrency']))
+        ]
+        try:
+            for threads in options['concurrency']:
+                for name, func in (('login', self.login),
+                                   ('password', self.change_password)):
+                    self.bench(name, func, users[:threads], requests)
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def bench(self, name, func, users, requests):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as executor:
+            timings = [
+                timing
+                for thread_timings in executor.map(
+                    lambda user: self.run_thread(func, user, requests), users)
+                for timing in thread_timings
+            ]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{name:8} threads={len(users):<3} '
+            f'p50={percentile(timings, 50):.1f}ms '
+            f'p95={percentile(timings, 95):.1f}ms '
+            f'p99={percentile(timings, 99):.1f}ms '
+            f'rps={len(timings) / elapsed:.1f}')
+
+    def run_thread(self, func, user, requests):
+        client = APIClient(HTTP_HOST='localhost')
+        timings = []
+        try:
+            for number in range(requests):
+                started = time.perf_counter()
+                func(client, user, number)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+        return timings
+
+    def login(self, client, user, number):
+        response = client.post(LOGIN_URL, {
+            'email': user.email,
+            'password': PASSWORDS[0],
+        }, format='json')
+        if response.status_code != 200:
+            raise CommandError(response.content)
+
+    def change_password(self, client, user, number):
+        client.force_authenticate(user)
+        response = client.post(SET_PASSWORD_URL, {
+            'current_password': PASSWORDS[number % 2],
+            'new_password': PASSWORDS[(number + 1) % 2],
+        }, format='json')
+        if response.status_code != 204:
+            raise CommandError(response.content)
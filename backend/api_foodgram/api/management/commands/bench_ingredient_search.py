@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import measure, summarize
+from api.filters import IngredientSearchFilter
+from recipes.models import Ingredient
+
+TERMS = ('а', 'мо', 'сах', 'масл', 'сыр', 'перец черный')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск ингредиентов с прежним фильтром '
+            'name__istartswith.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terms', nargs='+', default=TERMS)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        for term in options['terms']:
+            legacy = summarize(*measure(
+                lambda: list(Ingredient.objects.filter(
+                    name__istartswith=term)),
+                options['repeat'],
+            ))
+            ranked = summarize(*measure(
+                lambda: list(IngredientSearchFilter(
+                    {'name': term}, queryset=Ingredient.objects.all()).qs),
+                options['repeat'],
+            ))
+            self.stdout.write(
+                f'{term!r:16} istartswith p50={legacy["p50_ms"]}ms '
+                f'p95={legacy["p95_ms"]}ms | search p50={ranked["p50_ms"]}ms '
+                f'p95={ranked["p95_ms"]}ms')
@@ -0,0 +1,81 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from api.benchmarks import measure, summarize
+from recipes.models import Ingredient, Tag
+
+User = get_user_model()
+
+URL = '/api/recipes/'
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAA'
+         'fFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет создание и обновление рецептов в зависимости от числа '
+            'ингредиентов. Данные откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[1, 10, 30, 100])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        ingredient_ids = list(Ingredient.objects.values_list(
+            'id', flat=True)[:2 * max(options['sizes'])])
+        tag_ids = list(Tag.objects.values_list('id', flat=True)[:1])
+        if not tag_ids or len(ingredient_ids) < 2 * max(options['sizes']):
+            raise CommandError('Недостаточно тегов или ингредиентов в базе.')
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root), \
+                transaction.atomic():
+            user = User.objects.create(
+                username='bench_recipe_write',
+                email='bench_recipe_write@example.com',
+            )
+            client = APIClient(HTTP_HOST='localhost')
+            client.force_authenticate(user)
+            for size in options['sizes']:
+                self.bench(client, size, ingredient_ids, tag_ids,
+                           options['repeat'])
+            transaction.set_rollback(True)
+
+    def bench(self, client, size, ingredient_ids, tag_ids, repeat):
+        def payload(offset):
+            return {
+                'tags': tag_ids,
+                'ingredients': [
+                    {'id': pk, 'amount': 10}
+                    for pk in ingredient_ids[offset:offset + size]
+                ],
+                'name': 'bench',
+                'image': IMAGE,
+                'text': 'bench',
+                'cooking_time': 10,
+            }
+
+        created = []
+
+        def create():
+            response = client.post(URL, payload(0), format='json')
+            if response.status_code != 201:
+                raise CommandError(response.content)
+            created.append(response.data['id'])
+
+        def update():
+            response = client.put(
+                f'{URL}{created[-1]}/', payload(size // 2 or 1),
+                format='json')
+            if response.status_code != 200:
+                raise CommandError(response.content)
+
+        for name, func in (('create', create), ('update', update)):
+            result = summarize(*measure(func, repeat))
+            self.stdout.write(
+                f'{name:6} ingredients={size:<4} p50={result["p50_ms"]}ms '
+                f'p95={result["p95_ms"]}ms queries={result["queries"]}')
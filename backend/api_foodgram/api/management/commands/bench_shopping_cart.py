@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from api.benchmarks import measure, read_response, summarize
+from recipes.models import Recipe, ShoppingCartUser
+
+User = get_user_model()
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время скачивания списка покупок в зависимости '
+            'от числа рецептов в корзине. Данные откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[1, 10, 50, 100, 500])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--format', dest='file_format', default='txt',
+            choices=('txt', 'csv', 'json'))
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True)
+                          [:max(options['sizes'])])
+        if not recipe_ids:
+            raise CommandError('В базе нет рецептов для замера.')
+        with transaction.atomic():
+            user = User.objects.create(
+                username='bench_shopping_cart',
+                email='bench_shopping_cart@example.com',
+            )
+            client = APIClient(HTTP_HOST='localhost')
+            client.force_authenticate(user)
+            in_cart = 0
+            for size in options['sizes']:
+                if size > len(recipe_ids):
+                    self.stderr.write(
+                        f'В базе только {len(recipe_ids)} рецептов, '
+                        f'размер {size} пропущен.')
+                    continue
+                for recipe_id in recipe_ids[in_cart:size]:
+                    ShoppingCartUser.objects.create(
+                        user=user, recipe_id=recipe_id)
+                in_cart = max(in_cart, size)
+                result = summarize(*measure(
+                    lambda: read_response(client.get(
+                        URL, {'format': options['file_format']})),
+                    options['repeat'],
+                ))
+                self.stdout.write(
+                    f'recipes={size:<6} p50={result["p50_ms"]}ms '
+                    f'p95={result["p95_ms"]}ms p99={result["p99_ms"]}ms '
+                    f'queries={result["queries"]}')
+            transaction.set_rollback(True)
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import CachedTokenAuthentication
+from api.benchmarks import measure, summarize
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время и число запросов к БД при проверке токена '
+            'TokenAuthentication и CachedTokenAuthentication.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_active=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('Нужен хотя бы один активный пользователь.')
+        token, _ = Token.objects.get_or_create(user=user)
+        factory = APIRequestFactory()
+
+        def authenticate(authentication_class):
+            request = Request(factory.get(
+                '/api/recipes/', HTTP_AUTHORIZATION=f'Token {token.key}'))
+            return authentication_class().authenticate(request)
+
+        for authentication_class in (TokenAuthentication,
+                                     CachedTokenAuthentication):
+            authenticate(authentication_class)
+            stats = summarize(*measure(
+                lambda: authenticate(authentication_class),
+                options['repeat'],
+            ))
+            self.stdout.write(
+                f'{authentication_class.__name__:<28} '
+                f'p50={stats["p50_ms"]}ms p95={stats["p95_ms"]}ms '
+                f'queries={stats["queries"]}')
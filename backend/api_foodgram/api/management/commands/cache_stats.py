@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import HIT, MISS, cache_stats
+from api.urls import router
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кеша ответов API.'
+
+    def handle(self, *args, **options):
+        names = [
+            f'{basename}-{action}'
+            for _, viewset, basename in router.registry
+            for action, policy in getattr(
+                viewset, 'cache_policies', {}).items()
+            if policy.timeout
+        ]
+        for name, stats in cache_stats(names).items():
+            total = stats[HIT] + stats[MISS]
+            ratio = stats[HIT] / total if total else 0
+            self.stdout.write(
+                f'{name:<24} hit={stats[HIT]} miss={stats[MISS]} '
+                f'hit_ratio={ratio:.2f}')
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from api.filters import CustomRecipeFilterSet
+from api.views import recipes_for_user
+from recipes.models import Tag
+
+User = get_user_model()
+
+# Таблицы, которые при фильтрации должны читаться только по индексам.
+INDEXED_TABLES = (
+    'recipes_recipe',
+    'recipes_recipetag',
+    'recipes_favoriterecipeuser',
+    'recipes_shoppingcartuser',
+)
+
+
+class Command(BaseCommand):
+    help = ('Показывает план запроса рецептов с фильтрами tags, author, '
+            'is_favorited и is_in_shopping_cart. На PostgreSQL проверяет, '
+            'что таблицы читаются по индексам.')
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        request = RequestFactory().get('/api/recipes/')
+        request.user = user
+        filterset = CustomRecipeFilterSet(
+            {
+                'tags': list(Tag.objects.values_list('slug', flat=True)[:2]),
+                'author': [user.pk],
+                'is_favorited': 'true',
+                'is_in_shopping_cart': 'true',
+            },
+            queryset=recipes_for_user(user),
+            request=request,
+        )
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors)
+        queryset = filterset.qs.order_by('-pub_date', '-id')[:6]
+        postgres = connection.vendor == 'postgresql'
+        with transaction.atomic():
+            if postgres:
+                # На маленьких таблицах планировщик и так выберет Seq Scan.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.stdout.write(plan)
+        if not postgres:
+            self.stdout.write(
+                'Использование индексов проверяется только на PostgreSQL.')
+            return
+        seq_scans = [
+            table for table in INDEXED_TABLES
+            if f'Seq Scan on {table}' in plan
+        ]
+        if seq_scans:
+            raise CommandError(
+                'Без индекса читаются: ' + ', '.join(seq_scans))
+        self.stdout.write(self.style.SUCCESS(
+            'Все таблицы читаются по индексам.'))
@@ -0,0 +1,194 @@
+import json
+import logging
+import subprocess
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.benchmarks import measure, read_response, summarize
+from api.instrumentation import collect_budget_violations
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import Follow, User
+
+MODES = ('warm', 'cold')
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет основные запросы API через тестовый клиент и '
+            'сохраняет p50/p95/p99 и число SQL-запросов в JSON. '
+            'warm — с заполненными кешами, cold — кеш очищается перед '
+            'каждым запросом. Сценарии записи добавляют и сразу удаляют '
+            'избранное, рецепт в списке покупок и подписку. Данные для '
+            'замеров создаёт generate_synthetic_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument(
+            '--only', nargs='+', metavar='SCENARIO',
+            help='Запустить только перечисленные сценарии.')
+        parser.add_argument('--output', type=Path,
+                            help='Куда сохранить результаты в JSON.')
+        parser.add_argument(
+            '--compare', type=Path,
+            help='JSON прошлого запуска для сравнения.')
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Падать при превышении бюджета запросов действия.')
+
+    def handle(self, *args, **options):
+        scenarios = self.scenarios()
+        if options['only']:
+            unknown = set(options['only']) - scenarios.keys()
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}.')
+            scenarios = {
+                name: scenarios[name] for name in options['only']}
+        request_logger = logging.getLogger('api.requests')
+        level = request_logger.level
+        request_logger.setLevel(logging.WARNING)
+        try:
+            with collect_budget_violations() as violations:
+                results = {
+                    name: {
+                        mode: self.run(steps, mode, options['repeat'])
+                        for mode in options['modes']
+                    }
+                    for name, steps in scenarios.items()
+                }
+        finally:
+            request_logger.setLevel(level)
+        if options['strict'] and violations:
+            raise CommandError(
+                'Превышены бюджеты запросов:\n'
+                + '\n'.join(sorted(set(violations))))
+        report = {
+            'commit': git_commit(),
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'users': User.objects.count(),
+            'recipes': Recipe.objects.count(),
+            'repeat': options['repeat'],
+            'scenarios': results,
+        }
+        baseline = None
+        if options['compare']:
+            baseline = json.loads(options['compare'].read_text())
+        for name, modes in results.items():
+            for mode, result in modes.items():
+                self.stdout.write(
+                    f'{name:26} {mode:4} p50={result["p50_ms"]}ms '
+                    f'p95={result["p95_ms"]}ms p99={result["p99_ms"]}ms '
+                    f'queries={result["queries"]}'
+                    + self.difference(baseline, name, mode, result))
+        if options['output']:
+            options['output'].write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты сохранены в {options["output"]}'))
+
+    def scenarios(self):
+        """
+        Сценарий — шаги (клиент, метод, адрес, ожидаемый статус), которые
+        замеряются вместе; данные берутся самые нагруженные.
+        """
+        follower = Follow.objects.values('user').annotate(
+            follows=Count('id')).order_by('-follows').first()
+        author = User.objects.order_by('-recipes_count').first()
+        recipe = Recipe.objects.order_by('-favorites_count', '-id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        if follower is None or recipe is None or ingredient is None:
+            raise CommandError(
+                'Нет данных для замеров, запустите generate_synthetic_data.')
+        user = User.objects.get(pk=follower['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        anonymous = APIClient(HTTP_HOST='localhost')
+        client = APIClient(HTTP_HOST='localhost')
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        tags = '&'.join(
+            f'tags={slug}'
+            for slug in Tag.objects.values_list('slug', flat=True)[:2])
+        recipes = '/api/recipes/?limit=6'
+        reads = {
+            'recipes_list_anonymous': (anonymous, recipes),
+            'recipes_list': (client, recipes),
+            'recipes_list_cursor': (client, f'{recipes}&pagination=cursor'),
+            'recipes_list_tags': (client, f'{recipes}&{tags}'),
+            'recipes_list_author': (client, f'{recipes}&author={author.pk}'),
+            'recipes_list_favorited': (client, f'{recipes}&is_favorited=1'),
+            'recipes_list_in_cart': (
+                client, f'{recipes}&is_in_shopping_cart=1'),
+            'recipes_list_popular': (client, f'{recipes}&ordering=popular'),
+            'recipes_list_trending': (
+                client, f'{recipes}&ordering=trending'),
+            'recipe_detail': (client, f'/api/recipes/{recipe.pk}/'),
+            'feed': (client, '/api/recipes/feed/?limit=6'),
+            'subscriptions': (
+                client, '/api/users/subscriptions/?limit=6&recipes_limit=3'),
+            'download_shopping_cart': (
+                client, '/api/recipes/download_shopping_cart/'),
+            'ingredient_search': (
+                anonymous, f'/api/ingredients/?name={ingredient.name[:3]}'),
+        }
+        scenarios = {
+            name: [(reader, 'get', url, 200)]
+            for name, (reader, url) in reads.items()
+        }
+        target = Recipe.objects.exclude(
+            favorite_recipes__user=user).exclude(
+            recipe_in_shoplist__user=user).order_by(
+            '-favorites_count', '-id').first()
+        following = User.objects.exclude(pk=user.pk).exclude(
+            following__user=user).order_by('-recipes_count').first()
+        writes = {
+            'favorite': f'/api/recipes/{target.pk}/favorite/',
+            'shopping_cart': f'/api/recipes/{target.pk}/shopping_cart/',
+            'subscribe': f'/api/users/{following.pk}/subscribe/',
+        }
+        for name, url in writes.items():
+            scenarios[name] = [
+                (client, 'post', url, 201), (client, 'delete', url, 204)]
+        return scenarios
+
+    def run(self, steps, mode, repeat):
+        def request():
+            for client, method, url, expected in steps:
+                response = getattr(client, method)(url)
+                read_response(response)
+                if response.status_code != expected:
+                    raise CommandError(
+                        f'{method.upper()} {url}: {response.status_code}')
+
+        request()
+        return summarize(*measure(
+            request, repeat, setup=cache.clear if mode == 'cold' else None))
+
+    def difference(self, baseline, name, mode, result):
+        if baseline is None:
+            return ''
+        before = baseline['scenarios'].get(name, {}).get(mode)
+        if before is None:
+            return '  (нет в сравнении)'
+        change = (
+            (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+            if before['p95_ms'] else 0
+        )
+        queries = result['queries'] - before['queries']
+        return f'  p95 {change:+.0f}% queries {queries:+d}'
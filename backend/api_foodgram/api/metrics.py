@@ -0,0 +1,82 @@
+import ipaddress
+import os
+from hmac import compare_digest
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess,)
+
+# Значения метрик каждого воркера gunicorn хранятся в файлах каталога
+# PROMETHEUS_MULTIPROC_DIR, /metrics собирает их вместе.
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+OTHER_VIEW = 'other'
+
+REQUESTS = Counter(
+    'foodgram_http_requests_total',
+    'Запросы к API по действию вьюсета, методу и статусу ответа.',
+    ['view', 'method', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса.',
+    ['view'],
+)
+DB_QUERIES = Histogram(
+    'foodgram_db_queries_per_request',
+    'Число SQL-запросов за один запрос к API.',
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, float('inf')),
+)
+DB_DURATION = Histogram(
+    'foodgram_db_duration_seconds',
+    'Суммарное время SQL-запросов за один запрос к API.',
+    ['view'],
+)
+MUTATIONS = Counter(
+    'foodgram_mutations_total',
+    'Добавления и удаления избранного, списка покупок и подписок.',
+    ['kind', 'action'],
+)
+RESPONSE_CACHE = Counter(
+    'foodgram_response_cache_total',
+    'Попадания и промахи кеша ответов по вьюсету и действию.',
+    ['name', 'outcome'],
+)
+
+
+def observe_request(metrics, request, response):
+    view = metrics.view or OTHER_VIEW
+    REQUESTS.labels(view, request.method, response.status_code).inc()
+    REQUEST_DURATION.labels(view).observe(metrics.total_ms / 1000)
+    DB_QUERIES.labels(view).observe(metrics.queries)
+    DB_DURATION.labels(view).observe(metrics.db_ms / 1000)
+
+
+def metrics_allowed(request):
+    """Запрос с токеном METRICS_TOKEN или с адреса METRICS_ALLOWED_IPS."""
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and compare_digest(authorization, f'Bearer {token}'):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_IPS
+    )
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    registry = REGISTRY
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,98 @@
+import json
+import logging
+from contextlib import contextmanager
+
+from django.db import connection
+
+from api.instrumentation import (RequestMetrics, current_metrics,
+                                 query_budget_exceeded,)
+from api.metrics import observe_request
+
+logger = logging.getLogger('api.requests')
+
+_END = object()
+
+
+class InstrumentationMiddleware:
+    """
+    Число SQL-запросов, время БД, сериализации, проверки токена и общее
+    время запроса в заголовке Server-Timing и в JSON-записи лога
+    api.requests. Те же значения попадают в метрики Prometheus.
+
+    Имя действия и бюджет запросов задаёт InstrumentedViewMixin. Превышение
+    бюджета только пишется в лог и рассылается сигналом
+    query_budget_exceeded: данные к этому моменту уже сохранены.
+
+    Запросы потокового ответа выполняются при чтении тела, поэтому лог,
+    метрики и проверка бюджета откладываются до конца потока, а заголовок
+    Server-Timing, отправляемый до тела, их не учитывает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        with self.measure(metrics):
+            response = self.get_response(request)
+        auth_ms = getattr(request, 'auth_duration_ms', None)
+        timings = [
+            f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"',
+            f'serializer;dur={metrics.serializer_ms:.1f}',
+        ]
+        if auth_ms is not None:
+            timings.append(
+                f'auth;dur={auth_ms:.1f};desc="{request.auth_source}"')
+        timings.append(f'total;dur={metrics.total_ms:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                metrics, request, response, response.streaming_content)
+        else:
+            self.finish(metrics, request, response)
+        return response
+
+    @contextmanager
+    def measure(self, metrics):
+        token = current_metrics.set(metrics)
+        try:
+            with connection.execute_wrapper(metrics):
+                yield
+        finally:
+            current_metrics.reset(token)
+
+    def stream(self, metrics, request, response, content):
+        chunks = iter(content)
+        try:
+            while True:
+                with self.measure(metrics):
+                    chunk = next(chunks, _END)
+                if chunk is _END:
+                    return
+                yield chunk
+        finally:
+            self.finish(metrics, request, response)
+
+    def finish(self, metrics, request, response):
+        observe_request(metrics, request, response)
+        auth_ms = getattr(request, 'auth_duration_ms', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': metrics.view,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'query_budget': metrics.budget,
+            'db_ms': round(metrics.db_ms, 1),
+            'serializer_ms': round(metrics.serializer_ms, 1),
+            'auth_ms': None if auth_ms is None else round(auth_ms, 1),
+            'auth_source': getattr(request, 'auth_source', None),
+            'cache': response.get('X-Cache'),
+            'total_ms': round(metrics.total_ms, 1),
+        }
+        if metrics.over_budget:
+            logger.warning(json.dumps(record))
+            query_budget_exceeded.send(
+                sender=type(self), metrics=metrics, request=request)
+        else:
+            logger.info(json.dumps(record))
@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.cache import (HIT, MISS, get_cached_response, record,
+                       response_fingerprint, store_response,)
+from api.instrumentation import QUERY_BUDGET_MARGIN, current_metrics
+from api.pagination import cursor_mode_requested
+
+
+class CachedResponseMixin:
+    """
+    ETag, ответ 304 и кеш готовых ответов по правилам из cache_policies.
+
+    cache_policies сопоставляет действию вьюсета CachePolicy. ETag и ключ
+    кеша — один и тот же отпечаток адреса запроса, формата ответа и версий
+    данных, поэтому 304 и попадание в кеш обходятся без запросов к БД.
+    Хранятся только JSON-ответы: в HTML браузируемого API есть CSRF-токен.
+    Без общего кеша (SHARED_CACHE) ответы не кешируются и ETag не ставится.
+    """
+    cache_policies = {}
+
+    @property
+    def cache_name(self):
+        return f'{self.basename}-{self.action}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        policy = self.cache_policies.get(self.action)
+        if policy is None or not settings.SHARED_CACHE:
+            return handler(request, *args, **kwargs)
+        fingerprint = response_fingerprint(request, policy)
+        etag = f'"{fingerprint}"'
+        cacheable = (
+            policy.timeout and request.accepted_renderer.format == 'json'
+        )
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and etag in parse_etags(if_none_match):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif cacheable:
+            response = get_cached_response(fingerprint)
+            outcome = MISS if response is None else HIT
+            record(self.cache_name, outcome)
+            if response is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    store_response(fingerprint, response, policy.timeout)
+            response['X-Cache'] = outcome.upper()
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+        if policy.per_user:
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class CursorPaginationMixin:
+    """Переключает вьюсет на cursor_pagination_class по ?pagination=cursor."""
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.pagination_class
+            if (self.cursor_pagination_class is not None
+                    and cursor_mode_requested(self.request)):
+                pagination_class = self.cursor_pagination_class
+            self._paginator = (
+                pagination_class() if pagination_class is not None else None
+            )
+        return self._paginator
+
+
+class InstrumentedViewMixin:
+    """
+    Передаёт InstrumentationMiddleware имя действия и его бюджет запросов.
+
+    query_budgets сопоставляет действию вьюсета наибольшее число SQL-запросов
+    за весь запрос, включая проверку токена, измеренное тестами
+    tests/test_query_budgets.py и tests/test_queries.py. Бюджет — это число
+    плюс QUERY_BUDGET_MARGIN.
+    """
+    query_budgets = {}
+
+    def initial(self, request, *args, **kwargs):
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.view = f'{type(self).__name__}.{self.action}'
+            budget = self.query_budgets.get(self.action)
+            if budget is not None:
+                metrics.budget = budget + QUERY_BUDGET_MARGIN
+        super().initial(request, *args, **kwargs)
@@ -1,5 +1,107 @@
-from rest_framework.pagination import PageNumberPagination
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination,)
+
+from api.filters import RECIPE_ORDERINGS
+
+RECIPES_LIMIT_MAX = 50
+MAX_PAGE_SIZE = 100
+CURSOR_PAGINATION_PARAM = 'pagination'
+CURSOR_PAGINATION_MODE = 'cursor'
 
 
 class RecipeUserPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Постраничный вывод по курсору: без OFFSET и без COUNT(*).
+
+    Включается параметром ?pagination=cursor, ссылки next и previous
+    сохраняют его и остальные параметры запроса.
+    """
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        """Порядок из ?ordering=popular|trending, иначе по дате."""
+        return RECIPE_ORDERINGS.get(
+            request.query_params.get('ordering'), self.ordering)
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    """
+    Курсор ленты подписок — дата и id последнего рецепта страницы.
+
+    Страницу собирает recipes.feed.feed_positions, а не запрос к одной
+    таблице, поэтому позиция хранится явно и ссылки previous нет.
+    """
+
+    def paginate_feed(self, positions, request):
+        """
+        Id рецептов страницы; positions(limit, before) возвращает позиции
+        (pub_date, recipe_id) ленты старше before.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        page = positions(self.page_size + 1, self.get_position(request))
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_position = page[-1] if self.has_next else None
+        return [recipe_id for _, recipe_id in page]
+
+    def get_position(self, request):
+        cursor = self.decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return None
+        pub_date, _, recipe_id = cursor.position.rpartition('|')
+        try:
+            return datetime.fromisoformat(pub_date), int(recipe_id)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        pub_date, recipe_id = self.next_position
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=f'{pub_date.isoformat()}|{recipe_id}'))
+
+    def get_previous_link(self):
+        return None
+
+
+class SubscriptionsCursorPagination(RecipeCursorPagination):
+    ordering = ('username',)
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+
+def cursor_mode_requested(request):
+    return (request.query_params.get(CURSOR_PAGINATION_PARAM)
+            == CURSOR_PAGINATION_MODE)
+
+
+def get_recipes_limit(request):
+    """Проверенное значение recipes_limit, не больше RECIPES_LIMIT_MAX."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return RECIPES_LIMIT_MAX
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        raise ValidationError(
+            {'recipes_limit': 'Значение должно быть целым числом.'})
+    if recipes_limit < 0:
+        raise ValidationError(
+            {'recipes_limit': 'Значение не может быть отрицательным.'})
+    return min(recipes_limit, RECIPES_LIMIT_MAX)
@@ -0,0 +1,32 @@
+from django.db import connections
+from django.db.models import Case, IntegerField, Value, When
+
+from api.catalog import ingredient_catalog
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+
+def search_ingredients(queryset, term, limit=INGREDIENT_SEARCH_LIMIT):
+    """
+    Ингредиенты, название которых начинается с term, затем содержащие term.
+
+    В PostgreSQL поиск идёт по триграммному GIN-индексу, в остальных СУБД
+    (SQLite не умеет сравнивать кириллицу без учёта регистра) — по индексу
+    в памяти процесса.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        return queryset.filter(name__icontains=term).annotate(
+            rank=Case(
+                When(name__istartswith=term, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('rank', 'name')[:limit]
+    prefix, substring = ingredient_catalog.get().index.search(term, limit)
+    return queryset.filter(pk__in=prefix + substring).annotate(
+        rank=Case(
+            When(pk__in=prefix, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    ).order_by('rank', 'name')
@@ -1,36 +1,90 @@
+from collections import OrderedDict
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
-from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth.password_validation import validate_password
-from drf_extra_fields.fields import Base64ImageField
+from django.db import models, transaction
 from rest_framework import serializers
-
-from api.fields import Hex2NameColor
+from rest_framework.exceptions import NotFound
+
+from api.fields import (Hex2NameColor, ImageVariantsField,
+                        StreamingBase64ImageField,)
+from api.fragments import (fragment_keys, fragment_queryset, get_fragments,
+                           set_fragments,)
+from api.instrumentation import TimedListSerializer, TimedSerializerMixin
+from recipes.changes import IngredientChanges
+from recipes.images import delete_image_variants, schedule_image_variants
 from recipes.models import (FavoriteRecipeUser, Ingredient, Recipe,
                             RecipeIngredient, ShoppingCartUser, Tag,)
+from recipes.signals import recipe_ingredients_changed
 from users.models import Follow
 
 User = get_user_model()
 
 
+def list_instances(data):
+    return list(data.all() if isinstance(data, models.Manager) else data)
+
+
+class SubRecipeListSerializer(serializers.ListSerializer):
+    """Берёт поля из фрагментов RecipeSerializer, если они есть в кеше."""
+
+    def to_representation(self, data):
+        recipes = list_instances(data)
+        fragments = self.context.get('recipe_fragments')
+        if fragments is None:
+            fragments = get_fragments(
+                fragment_keys(recipes, self.context.get('request')))
+        fields = self.child.Meta.fields
+        return [
+            OrderedDict(
+                (field, fragments[recipe.pk][field]) for field in fields)
+            if recipe.pk in fragments
+            else self.child.to_representation(recipe)
+            for recipe in recipes
+        ]
+
+
 class SubRecipeSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
+        list_serializer_class = SubRecipeListSerializer
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time',
         )
 
 
-class SubscriptionsSerializer(serializers.ModelSerializer):
+class SubscriptionsListSerializer(TimedListSerializer):
+    """Фрагменты рецептов всех авторов страницы одним обращением к кешу."""
+
+    def to_representation(self, data):
+        authors = list_instances(data)
+        recipes = [
+            recipe
+            for author in authors
+            for recipe in getattr(author, 'limited_recipes', ())
+        ]
+        if recipes:
+            self.context['recipe_fragments'] = get_fragments(
+                fragment_keys(recipes, self.context.get('request')))
+        return super().to_representation(authors)
+
+
+class SubscriptionsSerializer(TimedSerializerMixin,
+                              serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
+        list_serializer_class = SubscriptionsListSerializer
         fields = (
             'email',
             'id',
@@ -46,27 +100,28 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
         return user_is_subscribed(self, obj)
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
-        recipes_limit = self.context['request'].GET.get('recipes_limit')
-        interest_user = obj
-        if recipes_limit:
-            return SubRecipeSerializer(
-                Recipe.objects.filter(author=interest_user)
-                [:int(recipes_limit)], many=True).data
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = Recipe.objects.filter(author=obj)[
+                :self.context['recipes_limit']]
         return SubRecipeSerializer(
-            Recipe.objects.filter(author=interest_user), many=True).data
+            recipes, many=True, context=self.context).data
 
 
 def user_is_subscribed(self, obj):
     user = self.context['request'].user
     if user.is_anonymous:
         return False
+    if hasattr(obj, 'is_subscribed'):
+        return obj.is_subscribed
     return Follow.objects.filter(user=user, following=obj.pk).exists()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -79,6 +134,7 @@ class UserSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
         )
+        list_serializer_class = TimedListSerializer
 
     def get_is_subscribed(self, obj):
         return user_is_subscribed(self, obj)
@@ -155,9 +211,15 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(TimedListSerializer):
+    def to_representation(self, data):
+        return self.child.to_representation_many(list_instances(data))
+
+
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
+    image_variants = ImageVariantsField()
     tags = TagSerializer(many=True)
     ingredients = RecipeIngredientSerializer(
         read_only=True,
@@ -178,25 +240,90 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
+        list_serializer_class = RecipeListSerializer
 
-    def get_is_favorited(self, obj):
+    def to_representation(self, instance):
+        representation = self.to_representation_many([instance])
+        if not representation:
+            raise NotFound('Рецепт удалён.')
+        return representation[0]
+
+    def to_representation_many(self, recipes):
+        """
+        Рецепты из кеша фрагментов с флагами текущего пользователя.
+
+        Фрагмент — общая для всех пользователей часть рецепта. Автор, теги
+        и ингредиенты загружаются только для рецептов, которых нет в кеше.
+        Удалённые за это время рецепты в ответ не попадают.
+        """
+        keys = fragment_keys(recipes, self.context.get('request'))
+        fragments = get_fragments(keys)
+        missing = [
+            recipe.pk for recipe in recipes if recipe.pk not in fragments]
+        if missing:
+            # Рецепты перечитываются уже после чтения версий: правка,
+            # сделанная раньше, попадёт во фрагмент, а сделанная позже
+            # сменит версию, и фрагмент больше не прочитают.
+            rendered = {
+                pk: self.strip_user_flags(
+                    super(RecipeSerializer, self).to_representation(recipe))
+                for pk, recipe in fragment_queryset().in_bulk(missing).items()
+            }
+            set_fragments(keys, rendered)
+            fragments.update(rendered)
+        return [
+            self.add_user_flags(fragments[recipe.pk], recipe)
+            for recipe in recipes if recipe.pk in fragments
+        ]
+
+    def strip_user_flags(self, data):
+        # Флаги остаются на своих местах, чтобы не менять порядок полей.
+        fragment = OrderedDict(
+            data, is_favorited=None, is_in_shopping_cart=None)
+        fragment['author'] = OrderedDict(data['author'], is_subscribed=None)
+        return fragment
+
+    def add_user_flags(self, fragment, recipe):
+        data = OrderedDict(
+            fragment,
+            is_favorited=self.get_is_favorited(recipe),
+            is_in_shopping_cart=self.get_is_in_shopping_cart(recipe),
+        )
+        data['author'] = OrderedDict(
+            fragment['author'],
+            is_subscribed=self.get_is_author_subscribed(recipe),
+        )
+        return data
+
+    def get_is_author_subscribed(self, obj):
         user = self.context['request'].user
-        if (user != AnonymousUser()
-                and FavoriteRecipeUser.objects.filter(
-                    user=user, recipe=obj.pk).exists()):
-            return True
-        return False
+        if user.is_anonymous:
+            return False
+        if hasattr(obj, 'is_author_subscribed'):
+            return obj.is_author_subscribed
+        return Follow.objects.filter(
+            user=user, following=obj.author_id).exists()
+
+    def _user_has_recipe(self, obj, annotation, model):
+        """Значение флага из аннотации queryset либо отдельным запросом."""
+        user = self.context['request'].user
+        if user.is_anonymous:
+            return False
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
+        return model.objects.filter(user=user, recipe=obj.pk).exists()
+
+    def get_is_favorited(self, obj):
+        return self._user_has_recipe(obj, 'is_favorited', FavoriteRecipeUser)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if (user != AnonymousUser()
-                and ShoppingCartUser.objects.filter(
-                    user=user, recipe=obj.pk).exists()):
-            return True
-        return False
+        return self._user_has_recipe(
+            obj, 'is_in_shopping_cart', ShoppingCartUser
+        )
 
 
 class IngredientAmountSerializer(serializers.ModelSerializer):
@@ -208,14 +335,15 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
+class RecipeCreateUpdateSerializer(TimedSerializerMixin,
+                                   serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True
     )
     ingredients = IngredientAmountSerializer(many=True)
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -236,20 +364,22 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         if not ingredients:
             raise serializers.ValidationError(
                 'Необходимо выбрать ингредиенты!')
-        for ingredient in ingredients:
-            cur_id = ingredient['id']
-            current_ingredient = Ingredient.objects.filter(id=cur_id).first()
-            if not current_ingredient:
-                raise serializers.ValidationError(
-                    f'Недопустимый id ингредиента \"{cur_id}\" -'
-                    + 'ингредиент не существует.')
-            if ingredient['amount'] < 1:
-                raise serializers.ValidationError(
-                    'Количество не может быть меньше 1!')
         ids = [ingredient['id'] for ingredient in ingredients]
+        found = Ingredient.objects.in_bulk(ids)
+        missing = [cur_id for cur_id in ids if cur_id not in found]
+        if missing:
+            raise serializers.ValidationError(
+                'Недопустимые id ингредиентов '
+                + ', '.join(f'\"{cur_id}\"' for cur_id in missing)
+                + ' - ингредиенты не существуют.')
+        if any(ingredient['amount'] < 1 for ingredient in ingredients):
+            raise serializers.ValidationError(
+                'Количество не может быть меньше 1!')
         if len(ids) != len(set(ids)):
             raise serializers.ValidationError(
                 'Данный ингредиент уже есть в рецепте!')
+        for ingredient in ingredients:
+            ingredient['ingredient'] = found[ingredient['id']]
         return ingredients
 
     def validate_tags(self, tags):
@@ -267,7 +397,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         for ingredient in ingredients:
             new_ingredient = RecipeIngredient(
                 recipe=recipe,
-                ingredient_id=ingredient['id'],
+                ingredient=ingredient['ingredient'],
                 amount=ingredient['amount'],
             )
             ingredients_list.append(new_ingredient)
@@ -278,13 +408,68 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
+        schedule_image_variants(recipe)
         return self.add_ingredients_and_tags(tags, ingredients, recipe)
 
+    def update_ingredients(self, recipe, ingredients):
+        """Удаляет, изменяет и добавляет только отличающиеся строки."""
+        current = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        new = {
+            ingredient['ingredient'].pk: ingredient
+            for ingredient in ingredients
+        }
+        changes = IngredientChanges(
+            added={},
+            removed={
+                ingredient_id: row.amount
+                for ingredient_id, row in current.items()
+                if ingredient_id not in new
+            },
+            changed={},
+        )
+        added_rows, changed_rows = [], []
+        for ingredient_id, ingredient in new.items():
+            row = current.get(ingredient_id)
+            if row is None:
+                changes.added[ingredient_id] = ingredient['amount']
+                added_rows.append(RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient['ingredient'],
+                    amount=ingredient['amount'],
+                ))
+            elif row.amount != ingredient['amount']:
+                changes.changed[ingredient_id] = (
+                    row.amount, ingredient['amount'])
+                row.amount = ingredient['amount']
+                changed_rows.append(row)
+        if changes.removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=changes.removed
+            ).delete()
+        if changed_rows:
+            RecipeIngredient.objects.bulk_update(changed_rows, ['amount'])
+        if added_rows:
+            RecipeIngredient.objects.bulk_create(added_rows)
+        return changes
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.ingredients.clear()
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if 'image' in validated_data:
+            delete_image_variants(instance.image_variants)
+            validated_data['image_variants'] = {}
         instance = super().update(instance, validated_data)
-        return self.add_ingredients_and_tags(
-            tags, ingredients, instance
-        )
+        if 'image' in validated_data:
+            schedule_image_variants(instance)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            changes = self.update_ingredients(instance, ingredients)
+            if changes:
+                recipe_ingredients_changed.send(
+                    sender=Recipe, recipe=instance, changes=changes)
+        return instance
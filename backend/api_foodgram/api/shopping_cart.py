@@ -0,0 +1,84 @@
+import csv
+import json
+
+from django.db.models import F
+from django.http import StreamingHttpResponse
+
+from recipes.models import ShoppingListItem
+
+FILENAME = 'my_shopping_cart'
+HEADER = ('Ваш сервис, Продуктовый помощник, подготовил \nсписок '
+          + 'покупок по выбранным рецептам:\n'
+          + 50 * '_'
+          + '\n\n')
+EMPTY_MESSAGE = ('К сожалению, в списке ваших покупок пусто - '
+                 + 'поскольку Вы не добавили в него ни одного рецепта.')
+CSV_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+
+
+def shopping_cart_ingredients(user):
+    """Суммарное количество каждого ингредиента из рецептов корзины."""
+    return ShoppingListItem.objects.filter(
+        user=user
+    ).values(
+        'total_amount',
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+    ).order_by('name')
+
+
+def txt_rows(ingredients):
+    yield HEADER
+    empty = True
+    for ingredient in ingredients:
+        empty = False
+        yield (f'\t•\t{ingredient["name"]} '
+               f'({ingredient["measurement_unit"]}) — '
+               f'{ingredient["total_amount"]}\n\n')
+    if empty:
+        yield EMPTY_MESSAGE
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['name'],
+            ingredient['measurement_unit'],
+            ingredient['total_amount'],
+        ))
+
+
+def json_rows(ingredients):
+    yield '['
+    separator = ''
+    for ingredient in ingredients:
+        yield separator + json.dumps(ingredient, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+FORMATS = {
+    'txt': (txt_rows, 'text/plain; charset=utf-8'),
+    'csv': (csv_rows, 'text/csv; charset=utf-8'),
+    'json': (json_rows, 'application/json'),
+}
+
+
+def shopping_cart_response(ingredients, file_format):
+    """Список покупок отдаётся построчно, не собираясь целиком в памяти."""
+    rows, content_type = FORMATS[file_format]
+    response = StreamingHttpResponse(
+        rows(ingredients.iterator()), content_type=content_type
+    )
+    response['Content-Disposition'] = 'attachment; filename={0}.{1}'.format(
+        FILENAME, file_format)
+    return response
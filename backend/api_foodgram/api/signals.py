@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_digest
+from api.catalog import ingredient_catalog, tag_catalog
+from api.metrics import MUTATIONS
+from api.versions import (RECIPES_VERSION, auth_version_name, bump_version,
+                          profile_version_name, recipe_version_name,
+                          user_version_name,)
+from recipes.models import (FavoriteRecipeUser, Ingredient, Recipe,
+                            RecipeIngredient, RecipeTag, ShoppingCartUser,
+                            Tag,)
+from recipes.signals import (image_variants_built, ingredients_loaded,
+                             recipe_ingredients_changed,
+                             recipe_scores_updated,)
+from users.models import Follow
+
+User = get_user_model()
+
+USER_PUBLIC_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+USER_AUTH_FIELDS = {'password', 'is_active'}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version(tag_catalog.name)
+    bump_version(RECIPES_VERSION)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(ingredients_loaded)
+def ingredient_changed(sender, **kwargs):
+    bump_version(ingredient_catalog.name)
+    bump_version(RECIPES_VERSION)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@receiver(recipe_ingredients_changed)
+def recipe_changed(sender, instance=None, **kwargs):
+    bump_version(RECIPES_VERSION)
+    for recipe_id in changed_recipe_ids(instance, **kwargs):
+        bump_version(recipe_version_name(recipe_id))
+
+
+def changed_recipe_ids(instance, recipe=None, reverse=False, pk_set=None,
+                       **kwargs):
+    """
+    id рецептов, чьи фрагменты устарели.
+
+    Смена тегов со стороны тега (tag.recipes.add) приходит с pk_set
+    рецептов; очистка с этой стороны их не сообщает, и такие рецепты
+    обновятся по версии справочника тегов или по истечении фрагмента.
+    """
+    if recipe is not None:
+        return [recipe.pk]
+    if isinstance(instance, Recipe):
+        return [instance.pk]
+    if isinstance(instance, (RecipeIngredient, RecipeTag)):
+        return [instance.recipe_id]
+    if reverse and pk_set:
+        return pk_set
+    return []
+
+
+@receiver(image_variants_built)
+def recipe_image_variants_built(sender, recipe_id, **kwargs):
+    bump_version(RECIPES_VERSION)
+    bump_version(recipe_version_name(recipe_id))
+
+
+@receiver(recipe_scores_updated)
+def recipe_scores_changed(sender, **kwargs):
+    """От оценок зависит только порядок выдачи, фрагменты рецептов те же."""
+    bump_version(RECIPES_VERSION)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """Данные автора входят в ответы с рецептами; вход в систему — нет."""
+    if update_fields is None or USER_PUBLIC_FIELDS & set(update_fields):
+        bump_version(RECIPES_VERSION)
+        bump_version(profile_version_name(instance.pk))
+
+
+@receiver(post_save, sender=FavoriteRecipeUser)
+@receiver(post_delete, sender=FavoriteRecipeUser)
+@receiver(post_save, sender=ShoppingCartUser)
+@receiver(post_delete, sender=ShoppingCartUser)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def user_relation_changed(sender, instance, **kwargs):
+    bump_version(user_version_name(instance.user_id))
+
+
+MUTATION_KINDS = {
+    FavoriteRecipeUser: 'favorite',
+    ShoppingCartUser: 'shopping_cart',
+    Follow: 'subscribe',
+}
+
+
+@receiver(post_save, sender=FavoriteRecipeUser)
+@receiver(post_save, sender=ShoppingCartUser)
+@receiver(post_save, sender=Follow)
+def user_relation_added(sender, created, **kwargs):
+    if created:
+        MUTATIONS.labels(MUTATION_KINDS[sender], 'add').inc()
+
+
+@receiver(post_delete, sender=FavoriteRecipeUser)
+@receiver(post_delete, sender=ShoppingCartUser)
+@receiver(post_delete, sender=Follow)
+def user_relation_removed(sender, **kwargs):
+    MUTATIONS.labels(MUTATION_KINDS[sender], 'remove').inc()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    bump_version(auth_version_name(token_digest(instance.key)))
+
+
+@receiver(post_save, sender=User)
+def user_credentials_changed(sender, instance, created,
+                             update_fields=None, **kwargs):
+    """Смена пароля или деактивация отзывает закешированный токен."""
+    if created:
+        return
+    if update_fields is None or USER_AUTH_FIELDS & set(update_fields):
+        for key in Token.objects.filter(user=instance).values_list(
+                'key', flat=True):
+            bump_version(auth_version_name(token_digest(key)))
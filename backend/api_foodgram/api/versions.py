@@ -0,0 +1,63 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'version:{}'
+RECIPES_VERSION = 'recipes'
+TAGS_VERSION = 'tags'
+INGREDIENTS_VERSION = 'ingredients'
+
+
+def get_version(name):
+    """
+    Текущая версия набора данных из общего кеша.
+
+    Версия — случайная метка, а не счётчик: если ключ вытеснен из кеша,
+    новая метка не совпадёт ни с одной из выданных раньше.
+    """
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_versions(names):
+    """Версии нескольких наборов данных одним обращением к кешу."""
+    keys = {VERSION_KEY.format(name): name for name in names}
+    versions = {
+        keys[key]: version for key, version in cache.get_many(keys).items()
+    }
+    for name in keys.values():
+        if name not in versions:
+            versions[name] = get_version(name)
+    return versions
+
+
+def bump_version(name):
+    """Меняет версию после фиксации текущей транзакции."""
+    transaction.on_commit(lambda: cache.set(
+        VERSION_KEY.format(name), uuid4().hex, timeout=None))
+
+
+def user_version_name(user_id):
+    """Версия избранного, списка покупок и подписок пользователя."""
+    return f'user:{user_id}'
+
+
+def recipe_version_name(recipe_id):
+    """Версия одного рецепта: его полей, тегов и ингредиентов."""
+    return f'recipe:{recipe_id}'
+
+
+def profile_version_name(user_id):
+    """Версия публичных полей пользователя, которые видны как автор."""
+    return f'profile:{user_id}'
+
+
+def auth_version_name(token_digest):
+    """Версия токена: меняется при выходе, смене пароля и деактивации."""
+    return f'auth:{token_digest}'
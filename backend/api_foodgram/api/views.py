@@ -1,21 +1,38 @@
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.hashers import check_password, make_password
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.contrib.auth.hashers import check_password
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Subquery, Value
+from django.http import Http404, HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
+from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from api.cache import (FEED_CACHE_TIMEOUT, RECIPES_CACHE_TIMEOUT,
+                       SUBSCRIPTIONS_CACHE_TIMEOUT, CachePolicy,)
+from api.catalog import ingredient_catalog, tag_catalog
 from api.filters import CustomRecipeFilterSet, IngredientSearchFilter
-from api.pagination import RecipeUserPagination
+from api.mixins import (CachedResponseMixin, CursorPaginationMixin,
+                        InstrumentedViewMixin,)
+from api.negotiation import IgnoreFormatContentNegotiation
+from api.pagination import (FeedCursorPagination, RecipeCursorPagination,
+                            RecipeUserPagination,
+                            SubscriptionsCursorPagination, get_recipes_limit,)
 from api.permissions import IsAuthorOrAdminOrReadOnly
 from api.serializers import (IngredientSerializer, NewUserSerializer,
                              RecipeCreateUpdateSerializer, RecipeSerializer,
                              SetPasswordSerializer, SubscriptionsSerializer,
                              TagSerializer, UserSerializer,)
+from api.shopping_cart import (FORMATS, shopping_cart_ingredients,
+                               shopping_cart_response,)
+from api.versions import RECIPES_VERSION
+from recipes.feed import feed_positions
 from recipes.models import (FavoriteRecipeUser, Ingredient, Recipe,
                             ShoppingCartUser, Tag,)
 from users.models import Follow
@@ -23,12 +40,100 @@ from users.models import Follow
 User = get_user_model()
 
 
-class UserViewSet(viewsets.ModelViewSet):
+def annotate_is_subscribed(queryset, user):
+    """Флаг подписки текущего пользователя на каждого из пользователей."""
+    if user.is_anonymous:
+        return queryset.annotate(is_subscribed=Value(False))
+    return queryset.annotate(
+        is_subscribed=Exists(Follow.objects.filter(
+            user=user, following=OuterRef('pk'))),
+    )
+
+
+def annotate_user_flags(queryset, user):
+    """
+    Флаги is_favorited, is_in_shopping_cart и подписки на автора рецепта
+    в том же SQL-запросе.
+    """
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_favorited=Value(False),
+            is_in_shopping_cart=Value(False),
+            is_author_subscribed=Value(False),
+        )
+    return queryset.annotate(
+        is_favorited=Exists(FavoriteRecipeUser.objects.filter(
+            user=user, recipe=OuterRef('pk'))),
+        is_in_shopping_cart=Exists(ShoppingCartUser.objects.filter(
+            user=user, recipe=OuterRef('pk'))),
+        is_author_subscribed=Exists(Follow.objects.filter(
+            user=user, following=OuterRef('author'))),
+    )
+
+
+def recipes_for_user(user, queryset=None):
+    """
+    Рецепты с флагами текущего пользователя для RecipeSerializer.
+
+    Автора, теги и ингредиенты сериализатор подгружает сам, одним запросом
+    на страницу и только для рецептов, которых нет в кеше фрагментов.
+    """
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    return annotate_user_flags(queryset, user)
+
+
+def subscriptions_for_user(user, recipes_limit):
+    """
+    Авторы, на которых подписан пользователь, для SubscriptionsSerializer.
+
+    Флаг подписки считается в запросе страницы, число рецептов хранится
+    в User.recipes_count, а первые recipes_limit рецептов всех авторов
+    страницы загружаются одним запросом.
+    """
+    latest_recipes = Recipe.objects.filter(
+        pk__in=Subquery(
+            Recipe.objects.filter(author=OuterRef('author'))
+            .order_by('-pub_date', '-id')
+            .values('pk')[:recipes_limit]
+        )
+    ).order_by('-pub_date', '-id')
+    queryset = User.objects.filter(following__user=user).prefetch_related(
+        Prefetch(
+            'author_recipes',
+            queryset=latest_recipes,
+            to_attr='limited_recipes',
+        ),
+    )
+    return annotate_is_subscribed(queryset, user)
+
+
+class UserViewSet(InstrumentedViewMixin, CachedResponseMixin,
+                  CursorPaginationMixin, viewsets.ModelViewSet):
     serializer_class = UserSerializer
     queryset = User.objects.all()
     search_fields = ('username', 'email')
     permission_classes = (AllowAny,)
     pagination_class = RecipeUserPagination
+    cursor_pagination_class = SubscriptionsCursorPagination
+    query_budgets = {
+        'list': 3,
+        'retrieve': 2,
+        'me': 1,
+        'set_password': 6,
+        'subscriptions': 4,
+        'subscribe': 9,
+    }
+    cache_policies = {
+        'subscriptions': CachePolicy(
+            versions=(RECIPES_VERSION,),
+            per_user=True,
+            timeout=SUBSCRIPTIONS_CACHE_TIMEOUT,
+        ),
+    }
+
+    def get_queryset(self):
+        return annotate_is_subscribed(User.objects.all(), self.request.user)
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -39,7 +144,8 @@ class UserViewSet(viewsets.ModelViewSet):
             methods=['get'],
             permission_classes=(IsAuthenticated,))
     def me(self, request):
-        user = get_object_or_404(User, email=request.user.email)
+        user = request.user
+        user.is_subscribed = False
         serializer = self.get_serializer(user)
         return Response(serializer.data)
 
@@ -47,13 +153,14 @@ class UserViewSet(viewsets.ModelViewSet):
             methods=['post'],
             permission_classes=(IsAuthenticated,))
     def set_password(self, request):
-        user = get_object_or_404(User, email=request.user.email)
+        user = request.user
         serializer = SetPasswordSerializer(data=request.data)
         if serializer.is_valid():
             if check_password(request.data['current_password'], user.password):
-                new_password = make_password(request.data['new_password'])
-                user.password = new_password
-                user.save()
+                user.set_password(request.data['new_password'])
+                user.save(update_fields=['password'])
+                # Старые токены после смены пароля не принимаются.
+                Token.objects.filter(user=user).delete()
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response(
                 {'current_password': 'Вы ввели неверный пароль'},
@@ -65,18 +172,19 @@ class UserViewSet(viewsets.ModelViewSet):
             methods=['get'],
             permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
-        user = request.user
-        queryset = User.objects.filter(following__user=user)
-        pages = self.paginate_queryset(queryset)
-        serializer = SubscriptionsSerializer(
-            data=pages,
-            many=True,
-            context={
-                'request': request
-            },
-        )
-        serializer.is_valid()
-        return self.get_paginated_response(data=serializer.data)
+        return self.cached_response(self.subscriptions_page, request)
+
+    def subscriptions_page(self, request):
+        recipes_limit = get_recipes_limit(request)
+        queryset = subscriptions_for_user(request.user, recipes_limit)
+        context = {'request': request, 'recipes_limit': recipes_limit}
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            serializer = SubscriptionsSerializer(
+                queryset, many=True, context=context)
+            return Response(serializer.data)
+        serializer = SubscriptionsSerializer(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=True,
             methods=['post', 'delete'],
@@ -85,6 +193,7 @@ class UserViewSet(viewsets.ModelViewSet):
         """Метод обрабатывающий эндпоинт subscribe."""
         interest_user = get_object_or_404(User, id=pk)
         if request.method == 'POST':
+            recipes_limit = get_recipes_limit(request)
             if request.user == interest_user:
                 return Response(
                     {'errors': 'Невозможно подписаться на самого себя.'},
@@ -103,7 +212,8 @@ class UserViewSet(viewsets.ModelViewSet):
             serializer = SubscriptionsSerializer(
                 interest_user,
                 context={
-                    'request': request
+                    'request': request,
+                    'recipes_limit': recipes_limit,
                 },
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -121,20 +231,75 @@ class UserViewSet(viewsets.ModelViewSet):
         )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class CatalogViewSetMixin:
+    """
+    Отдаёт справочник готовым JSON из памяти, минуя ORM и сериализаторы.
+
+    Снимок в памяти узнаёт об изменениях по версии в общем кеше, поэтому
+    без него (SHARED_CACHE) справочник читается из БД как обычно.
+    """
+    catalog = None
+
+    def list(self, request, *args, **kwargs):
+        if not settings.SHARED_CACHE:
+            return super().list(request, *args, **kwargs)
+        return json_response(self.get_list_json(self.catalog.get()))
+
+    def get_list_json(self, snapshot):
+        return snapshot.list_json
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.SHARED_CACHE:
+            return super().retrieve(request, *args, **kwargs)
+        items = self.catalog.get().items
+        try:
+            return json_response(items[int(kwargs['pk'])])
+        except (KeyError, ValueError):
+            raise Http404
+
+
+def json_response(content):
+    return HttpResponse(content, content_type='application/json')
+
+
+class TagViewSet(InstrumentedViewMixin, CachedResponseMixin,
+                 CatalogViewSetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
     permission_classes = (AllowAny,)
+    catalog = tag_catalog
+    query_budgets = dict.fromkeys(('list', 'retrieve'), 2)
+    cache_policies = dict.fromkeys(
+        ('list', 'retrieve'), CachePolicy(versions=(tag_catalog.name,)))
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(InstrumentedViewMixin, CachedResponseMixin,
+                        CatalogViewSetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientSearchFilter
     permission_classes = (AllowAny,)
+    catalog = ingredient_catalog
+    query_budgets = {'list': 3, 'retrieve': 2}
+    cache_policies = dict.fromkeys(
+        ('list', 'retrieve'),
+        CachePolicy(versions=(ingredient_catalog.name,)),
+    )
+
+    def get_list_json(self, snapshot):
+        """
+        Поиск по ?name= идёт через фильтр и search_ingredients, из базы
+        берутся только id найденных ингредиентов.
+        """
+        if not self.request.query_params.get('name'):
+            return snapshot.list_json
+        return snapshot.join(
+            self.filter_queryset(self.get_queryset())
+            .values_list('pk', flat=True))
 
 
+@transaction.atomic
 def post_delete_relationship_user_with_object(request, pk, model, message):
     recipe = get_object_or_404(Recipe, id=pk)
     if request.method == 'POST':
@@ -168,17 +333,62 @@ def post_delete_relationship_user_with_object(request, pk, model, message):
     )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(InstrumentedViewMixin, CachedResponseMixin,
+                    CursorPaginationMixin, viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     queryset = Recipe.objects.all()
     pagination_class = RecipeUserPagination
+    cursor_pagination_class = RecipeCursorPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = CustomRecipeFilterSet
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
+    # create рассылает рецепт по лентам подписчиков, а update,
+    # partial_update, destroy и shopping_cart меняют списки покупок всех
+    # пользователей с рецептом в корзине. В PostgreSQL это постоянное
+    # число запросов, а в SQLite bulk_create делится на пачки по 999
+    # параметров, и запросов становится больше с ростом числа подписчиков,
+    # ингредиентов и пользователей. В update и partial_update входит
+    # сохранение копий картинки при IMAGE_VARIANT_WORKERS = 0.
+    query_budgets = {
+        'list': 7,
+        'retrieve': 6,
+        'feed': 8,
+        'create': 24,
+        'update': 26,
+        'partial_update': 26,
+        'destroy': 20,
+        'favorite': 8,
+        'shopping_cart': 13,
+        'download_shopping_cart': 2,
+    }
+    cache_policies = {
+        **dict.fromkeys(
+            ('list', 'retrieve'),
+            CachePolicy(
+                versions=(RECIPES_VERSION,),
+                per_user=True,
+                timeout=RECIPES_CACHE_TIMEOUT,
+            ),
+        ),
+        'feed': CachePolicy(
+            versions=(RECIPES_VERSION,),
+            per_user=True,
+            timeout=FEED_CACHE_TIMEOUT,
+        ),
+    }
+
+    def get_queryset(self):
+        return recipes_for_user(self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_update(self, serializer):
+        serializer.save()
+        # Ответ строится по рецепту, заново загруженному со всеми связями.
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk)
+
     def get_permissions(self):
         """Ветвление пермишенов."""
         if self.action in ['list', 'retrieve']:
@@ -211,33 +421,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
     @action(detail=False,
-            methods=['get'])
+            methods=['get'],
+            permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        return self.cached_response(self.feed_page, request)
+
+    def feed_page(self, request):
+        """Лента подписок по дате, всегда постранично по курсору."""
+        paginator = FeedCursorPagination()
+        recipe_ids = paginator.paginate_feed(
+            partial(feed_positions, request.user), request)
+        recipes = recipes_for_user(request.user).in_bulk(recipe_ids)
+        page = [recipes[pk] for pk in recipe_ids if pk in recipes]
+        serializer = RecipeSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False,
+            methods=['get'],
+            permission_classes=(IsAuthenticated,),
+            content_negotiation_class=IgnoreFormatContentNegotiation)
     def download_shopping_cart(self, request):
-        recipes_user_in_shoplist = ShoppingCartUser.objects.filter(
-            user=request.user
-        )
-        recipes = Recipe.objects.filter(
-            recipe_in_shoplist__in=recipes_user_in_shoplist
-        )
-        ingredients = Ingredient.objects.filter(
-            ingredient_in_recipe__recipe__in=recipes
-        )
-        queryset_ingredients = ingredients.annotate(
-            sum_amount_ingredients=(Sum('ingredient_in_recipe__amount'))
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in FORMATS:
+            return Response(
+                {'format': ('Допустимые форматы: '
+                            + ', '.join(FORMATS) + '.')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return shopping_cart_response(
+            shopping_cart_ingredients(request.user), file_format
         )
-        content = ('Ваш сервис, Продуктовый помощник, подготовил \nсписок '
-                   + 'покупок по выбранным рецептам:\n'
-                   + 50 * '_'
-                   + '\n\n')
-        if not queryset_ingredients:
-            content += ('К сожалению, в списке ваших покупок пусто - '
-                        + 'поскольку Вы не добавили в него ни одного рецепта.')
-        else:
-            for ingr in queryset_ingredients:
-                content += (f'\t•\t{ingr.name} ({ingr.measurement_unit}) — '
-                            + f'{ingr.sum_amount_ingredients}\n\n')
-        filename = 'my_shopping_cart.txt'
-        response = HttpResponse(content, content_type='text/plain')
-        response['Content-Disposition'] = 'attachment; filename={0}'.format(
-            filename)
-        return response
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,6 +78,34 @@ DATABASES = {
     }
 }
 
+REDIS_URL = os.getenv('REDIS_URL')
+# Версии данных, отзыв токенов и сброс кешей видны всем воркерам gunicorn
+# только через общий кеш. LocMemCache у каждого процесса свой, поэтому без
+# REDIS_URL кеш токенов, ответов, фрагментов рецептов и справочников
+# выключен; SHARED_CACHE=True включает их при одном процессе.
+SHARED_CACHE = os.getenv(
+    'SHARED_CACHE', default=str(bool(REDIS_URL))) == 'True'
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'IGNORE_EXCEPTIONS': True,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'foodgram',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -93,6 +122,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Первый хешер используется для новых паролей, остальные только проверяют
+# старые хеши. При входе пароль перехешируется, если хешер или его
+# параметры изменились.
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', default='pbkdf2')
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.getenv('PASSWORD_PBKDF2_ITERATIONS', default=260000)
+)
+PASSWORD_ARGON2_TIME_COST = int(
+    os.getenv('PASSWORD_ARGON2_TIME_COST', default=2)
+)
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.getenv('PASSWORD_ARGON2_MEMORY_COST', default=102400)
+)
+PASSWORD_ARGON2_PARALLELISM = int(
+    os.getenv('PASSWORD_ARGON2_PARALLELISM', default=8)
+)
+PASSWORD_HASHERS = [
+    'users.hashers.PBKDF2PasswordHasher',
+    'users.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+if PASSWORD_HASHER == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+
 AUTH_USER_MODEL = 'users.User'
 
 LANGUAGE_CODE = 'ru'
@@ -109,6 +163,40 @@ STATIC_URL = '/backend_static/'
 STATIC_ROOT = BASE_DIR / 'backend_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', default=5 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_SIDE = int(os.getenv('RECIPE_IMAGE_MAX_SIDE', default=4096))
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', default=2))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', default=1024))
+AUTH_TOKEN_CACHE_TIMEOUT = int(
+    os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', default=60 * 60)
+)
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', default=1000))
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', default=100))
+# /metrics отдаётся по заголовку Authorization: Bearer <METRICS_TOKEN>
+# или адресам из METRICS_ALLOWED_IPS (через запятую, можно подсети).
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = [
+    network.strip() for network in os.getenv(
+        'METRICS_ALLOWED_IPS', default='127.0.0.1,::1').split(',')
+    if network.strip()
+]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('API_REQUEST_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -118,7 +206,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
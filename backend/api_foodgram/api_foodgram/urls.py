@@ -3,9 +3,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.metrics import metrics_view
+
 urlpatterns = [
     path('api/', include('api.urls'), name='api'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 
@@ -1,7 +1,28 @@
+from contextlib import contextmanager
+
 from django.contrib import admin
 
+from .changes import IngredientChanges
 from .models import (FavoriteRecipeUser, Ingredient, Recipe, RecipeIngredient,
                      RecipeTag, ShoppingCartUser, Tag,)
+from .shopping_list import recipe_amounts
+from .signals import recipe_ingredients_changed
+
+
+@contextmanager
+def ingredient_changes(recipe_ids):
+    """
+    Сообщает recipe_ingredients_changed о правке ингредиентов рецептов
+    в админке, как это делает сериализатор рецепта в API.
+    """
+    before = {recipe_id: recipe_amounts(recipe_id) for recipe_id in recipe_ids}
+    yield
+    for recipe in Recipe.objects.filter(pk__in=recipe_ids):
+        changes = IngredientChanges.between(
+            before[recipe.pk], recipe_amounts(recipe.pk))
+        if changes:
+            recipe_ingredients_changed.send(
+                sender=Recipe, recipe=recipe, changes=changes)
 
 
 class RecipeTagInline(admin.TabularInline):
@@ -13,16 +34,41 @@ class RecipeIngredientInline(admin.TabularInline):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'num_favorite_recipes',)
+    list_display = ('name', 'author', 'favorites_count', 'in_carts_count',)
     list_filter = ('author', 'name', 'tags',)
+    list_select_related = ('author',)
+    readonly_fields = ('favorites_count', 'in_carts_count',)
     inlines = [RecipeTagInline, RecipeIngredientInline, ]
 
-    def num_favorite_recipes(self, obj):
-        return FavoriteRecipeUser.objects.filter(recipe=obj).count()
-
     class Meta:
         model = Recipe
 
+    def save_related(self, request, form, formsets, change):
+        recipe_ids = {form.instance.pk} if change else set()
+        with ingredient_changes(recipe_ids):
+            super().save_related(request, form, formsets, change)
+
+
+class RecipeIngredientAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'ingredient', 'amount',)
+    list_select_related = ('recipe', 'ingredient',)
+
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.add(form.initial['recipe'])
+        with ingredient_changes(recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with ingredient_changes({obj.recipe_id}):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with ingredient_changes(
+                set(queryset.values_list('recipe_id', flat=True))):
+            super().delete_queryset(request, queryset)
+
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit',)
@@ -37,7 +83,7 @@ class TagAdmin(admin.ModelAdmin):
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(FavoriteRecipeUser)
-admin.site.register(RecipeIngredient)
+admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
 admin.site.register(RecipeTag)
 admin.site.register(ShoppingCartUser)
 admin.site.register(Tag, TagAdmin)
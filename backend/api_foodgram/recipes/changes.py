@@ -0,0 +1,52 @@
+from collections import namedtuple
+
+
+class IngredientChanges(
+        namedtuple('IngredientChanges', ('added', 'removed', 'changed'))):
+    """
+    Изменения ингредиентов рецепта при редактировании.
+
+    added и removed — {ingredient_id: amount},
+    changed — {ingredient_id: (old_amount, new_amount)}.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def between(cls, old, new):
+        """Изменения от {ingredient_id: amount} old к new."""
+        return cls(
+            added={
+                ingredient_id: amount for ingredient_id, amount in new.items()
+                if ingredient_id not in old
+            },
+            removed={
+                ingredient_id: amount for ingredient_id, amount in old.items()
+                if ingredient_id not in new
+            },
+            changed={
+                ingredient_id: (old[ingredient_id], amount)
+                for ingredient_id, amount in new.items()
+                if ingredient_id in old and old[ingredient_id] != amount
+            },
+        )
+
+    def __bool__(self):
+        return any((self.added, self.removed, self.changed))
+
+    @property
+    def ingredient_ids(self):
+        return self.added.keys() | self.removed.keys() | self.changed.keys()
+
+    @property
+    def delta(self):
+        """Изменение количества каждого ингредиента: {ingredient_id: delta}."""
+        delta = dict(self.added)
+        delta.update(
+            (ingredient_id, -amount)
+            for ingredient_id, amount in self.removed.items()
+        )
+        delta.update(
+            (ingredient_id, new - old)
+            for ingredient_id, (old, new) in self.changed.items()
+        )
+        return delta
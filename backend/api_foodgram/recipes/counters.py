@@ -0,0 +1,58 @@
+from typing import NamedTuple
+
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipeUser, Recipe, ShoppingCartUser
+
+User = get_user_model()
+
+
+class Counter(NamedTuple):
+    """Поле field модели model хранит число строк rows, ссылающихся на неё."""
+    model: type
+    field: str
+    rows: type
+    foreign_key: str
+
+    def change(self, pk, delta):
+        """Атомарно меняет счётчик; ниже нуля он не опускается."""
+        self.change_many([pk], delta)
+
+    def change_many(self, pks, delta):
+        """Меняет счётчики объектов pks одним UPDATE."""
+        if not pks:
+            return
+        queryset = self.model.objects.filter(pk__in=pks)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{self.field}__gte': -delta})
+        queryset.update(**{self.field: F(self.field) + delta})
+
+    def actual(self):
+        """Выражение с настоящим числом строк, для сверки."""
+        return Coalesce(
+            Subquery(
+                self.rows.objects.filter(**{self.foreign_key: OuterRef('pk')})
+                .order_by()
+                .values(self.foreign_key)
+                .annotate(total=Count('pk'))
+                .values('total'),
+                output_field=models.IntegerField(),
+            ),
+            0,
+        )
+
+    def drifted(self):
+        """Объекты, у которых счётчик разошёлся с числом строк."""
+        return self.model.objects.annotate(actual=self.actual()).exclude(
+            **{self.field: F('actual')})
+
+
+COUNTERS = (
+    Counter(Recipe, 'favorites_count', FavoriteRecipeUser, 'recipe'),
+    Counter(Recipe, 'in_carts_count', ShoppingCartUser, 'recipe'),
+    Counter(User, 'recipes_count', Recipe, 'author'),
+)
+COUNTERS_BY_ROWS = {counter.rows: counter for counter in COUNTERS}
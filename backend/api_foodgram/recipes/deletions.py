@@ -0,0 +1,60 @@
+"""
+Строки, удаляемые каскадом вместе с рецептом или пользователем.
+
+Django рассылает pre_delete сначала зависимым строкам, затем самому
+объекту, а post_delete — в том же порядке, уже после удаления. Строка
+регистрируется в своём pre_delete, родитель в своём pre_delete отмечает
+её, и в post_delete строка знает, что счётчики и списки родителя
+обновлять не нужно: они удаляются или уже пересчитаны одним запросом.
+
+Строки хранятся по слабым ссылкам и только в текущем потоке, поэтому
+после отката удаления ничего не остаётся.
+"""
+import threading
+from weakref import WeakValueDictionary
+
+_local = threading.local()
+
+
+def _pending():
+    if not hasattr(_local, 'pending'):
+        _local.pending = {}
+    return _local.pending
+
+
+def track(instance, *parents):
+    """Регистрирует удаляемую строку; parents — пары (модель, pk)."""
+    instance._deleted_parents = set()
+    instance._tracked_parents = parents
+    pending = _pending()
+    for parent in parents:
+        pending.setdefault(parent, WeakValueDictionary())[
+            id(instance)] = instance
+
+
+def parent_deleted(model, pk):
+    """Отмечает строки, удаляемые вместе с объектом, и возвращает их."""
+    rows = list(_pending().pop((model, pk), {}).values())
+    for row in rows:
+        row._deleted_parents.add((model, pk))
+    return rows
+
+
+def deleted_with(instance, model, pk):
+    return (model, pk) in getattr(instance, '_deleted_parents', ())
+
+
+def parents_deleted(instance):
+    return bool(getattr(instance, '_deleted_parents', ()))
+
+
+def forget(instance):
+    """Снимает строку с учёта после её удаления."""
+    pending = _pending()
+    for parent in getattr(instance, '_tracked_parents', ()):
+        rows = pending.get(parent)
+        if rows is None:
+            continue
+        rows.pop(id(instance), None)
+        if not rows:
+            del pending[parent]
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db.models import Q
+
+from recipes.models import FeedItem, Recipe
+from users.models import Follow
+
+BATCH_SIZE = 1000
+
+
+def fan_out(recipe):
+    """
+    Записывает новый рецепт в ленты подписчиков автора.
+
+    Рецепты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT, не
+    рассылаются: feed_positions находит их при чтении по подпискам.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    followers = list(
+        Follow.objects.filter(following_id=recipe.author_id)
+        .values_list('user_id', flat=True)[:limit + 1]
+    )
+    if len(followers) > limit:
+        return
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+            for user_id in followers
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    Recipe.objects.filter(pk=recipe.pk).update(fanned_out=True)
+    recipe.fanned_out = True
+
+
+def backfill(user_id, author_id):
+    """Последние разосланные рецепты автора — в ленту нового подписчика."""
+    recipes = Recipe.objects.filter(
+        author_id=author_id, fanned_out=True
+    ).order_by('-pub_date', '-id').values_list(
+        'pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+            for pk, pub_date in recipes
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def unfollow(user_id, author_id):
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author_id=author_id).delete()
+
+
+def feed_positions(user, limit, before=None):
+    """
+    Первые limit позиций ленты (pub_date, recipe_id) старше позиции before.
+
+    Разосланные рецепты читаются из ленты пользователя по индексу
+    (user, -pub_date, -recipe). Остальные — рецепты популярных авторов и
+    опубликованные до появления лент — находятся по подпискам вторым
+    запросом, тоже не больше limit строк, и сливаются с первыми по дате.
+    """
+    items = FeedItem.objects.filter(user=user)
+    pending = Recipe.objects.filter(
+        fanned_out=False,
+        author__in=Follow.objects.filter(user=user).values('following'),
+    )
+    if before is not None:
+        pub_date, recipe_id = before
+        items = items.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, recipe_id__lt=recipe_id))
+        pending = pending.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=recipe_id))
+    positions = list(
+        items.order_by('-pub_date', '-recipe_id')
+        .values_list('pub_date', 'recipe_id')[:limit])
+    positions += pending.order_by('-pub_date', '-id').values_list(
+        'pub_date', 'id')[:limit]
+    return sorted(set(positions), reverse=True)[:limit]
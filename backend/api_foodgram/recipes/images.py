@@ -0,0 +1,119 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipes/variants'
+VARIANTS = {
+    'thumbnail': {'size': (320, 320), 'format': 'JPEG', 'extension': 'jpg'},
+    'medium': {'size': (960, 960), 'format': 'JPEG', 'extension': 'jpg'},
+    'webp': {'size': (960, 960), 'format': 'WEBP', 'extension': 'webp'},
+}
+QUALITY = 82
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+    return _executor
+
+
+def render_variant(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, format=image_format, quality=QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def build_image_variants(recipe_id, image_name):
+    """Уменьшенные копии картинки рецепта: для списков, карточки и WebP."""
+    from recipes.models import Recipe
+    from recipes.signals import image_variants_built
+
+    try:
+        with default_storage.open(image_name) as file:
+            image = Image.open(file)
+            image = image.convert('RGB')
+        stem = PurePosixPath(image_name).stem
+        variants = {}
+        for name, spec in VARIANTS.items():
+            content = render_variant(image, spec['size'], spec['format'])
+            variants[name] = default_storage.save(
+                f'{VARIANTS_DIR}/{stem}_{name}.{spec["extension"]}',
+                ContentFile(content),
+            )
+        # Картинку могли заменить, пока готовились копии: они сохраняются,
+        # только если у рецепта всё ещё та же картинка.
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=image_name
+        ).update(image_variants=variants)
+        if not updated:
+            delete_image_variants(variants)
+            return
+        image_variants_built.send(sender=Recipe, recipe_id=recipe_id)
+    except Exception:
+        logger.exception(
+            'Не удалось подготовить картинки рецепта %s', recipe_id)
+
+
+def delete_image_variants(variants):
+    """
+    После фиксации транзакции удаляет файлы уменьшенных копий картинки.
+
+    Вызывается при замене картинки и удалении рецепта; при откате
+    транзакции файлы остаются на месте.
+    """
+    names = [name for name in variants.values() if name]
+
+    def delete():
+        for name in names:
+            try:
+                default_storage.delete(name)
+            except OSError:
+                logger.exception('Не удалось удалить файл %s', name)
+
+    if names:
+        transaction.on_commit(delete)
+
+
+def build_in_worker(recipe_id, image_name):
+    try:
+        build_image_variants(recipe_id, image_name)
+    finally:
+        connection.close()
+
+
+def schedule_image_variants(recipe):
+    """
+    После фиксации транзакции ставит обработку картинки в очередь.
+
+    При IMAGE_VARIANT_WORKERS = 0 картинка обрабатывается сразу,
+    в том же потоке.
+    """
+    recipe_id, image_name = recipe.pk, recipe.image.name
+
+    def submit():
+        if settings.IMAGE_VARIANT_WORKERS:
+            get_executor().submit(build_in_worker, recipe_id, image_name)
+        else:
+            build_image_variants(recipe_id, image_name)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,251 @@
+import random
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from recipes.models import (FavoriteRecipeUser, Ingredient, Recipe,
+                            RecipeIngredient, RecipeTag, ShoppingCartUser,
+                            Tag,)
+from users.models import Follow
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+PREFIX = 'synthetic'
+PASSWORD = 'synthetic-password'
+IMAGE_NAME = 'recipes/synthetic.jpg'
+TAGS = (
+    ('Завтрак', '#008000', 'breakfast'),
+    ('Обед', '#FFA500', 'lunch'),
+    ('Ужин', '#8B0000', 'dinner'),
+)
+
+
+def zipf_weights(size, alpha):
+    """Накопленные веса закона Ципфа: элемент ранга r выбирают ~ 1/r^alpha."""
+    total, weights = 0, []
+    for rank in range(1, size + 1):
+        total += 1 / rank ** alpha
+        weights.append(total)
+    return weights
+
+
+def power_law_size(rng, mean, alpha, limit):
+    """Размер с распределением Парето и заданным средним, не больше limit."""
+    scale = mean * (alpha - 1) / alpha
+    return min(int(scale * rng.paretovariate(alpha)), limit)
+
+
+def sample_distinct(rng, population, cum_weights, size, exclude=None):
+    """size разных элементов population, выбранных с весами cum_weights."""
+    chosen = set()
+    attempts = 0
+    while len(chosen) < size and attempts < size * 10:
+        for item in rng.choices(population, cum_weights=cum_weights,
+                                k=size - len(chosen)):
+            if item != exclude:
+                chosen.add(item)
+        attempts += size
+    return chosen
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетических пользователей, рецепты, избранное, '
+            'списки покупок и подписки для нагрузочного тестирования. '
+            'Популярность рецептов и авторов подчиняется степенному закону.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='Среднее число избранных рецептов у пользователя.')
+        parser.add_argument(
+            '--carts', type=float, default=5,
+            help='Среднее число рецептов в списке покупок.')
+        parser.add_argument(
+            '--follows', type=float, default=10,
+            help='Среднее число подписок пользователя.')
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, nargs=2, default=(3, 15),
+            metavar=('MIN', 'MAX'))
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона популярности.')
+        parser.add_argument(
+            '--ingredients', type=Path,
+            help='Сначала загрузить ингредиенты из файла, '
+                 'например data/ingredients.csv.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить синтетические данные прошлого запуска.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['ingredients']:
+            call_command('load_ingredients', options['ingredients'],
+                         stdout=StringIO())
+        if options['clear']:
+            deleted, _ = User.objects.filter(
+                username__startswith=f'{PREFIX}_').delete()
+            self.stdout.write(f'Удалено объектов: {deleted}')
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужны хотя бы два пользователя и один рецепт.')
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        low, high = options['ingredients_per_recipe']
+        if len(ingredient_ids) < high or not 1 <= low <= high:
+            raise CommandError(
+                'Ингредиентов в базе меньше, чем нужно на рецепт: загрузите '
+                'их через --ingredients data/ingredients.csv.')
+        if User.objects.filter(username__startswith=f'{PREFIX}_').exists():
+            raise CommandError(
+                'Синтетические данные уже есть, добавьте --clear.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(
+                user_ids, options['recipes'], ingredient_ids, low, high,
+                options['alpha'])
+            self.create_relations(
+                user_ids, recipe_ids, options['alpha'], options)
+        for command in ('reconcile_counters', 'rebuild_shopping_lists',
+                        'update_recipe_scores'):
+            call_command(command, stdout=StringIO())
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: пользователей {len(user_ids)}, '
+            f'рецептов {len(recipe_ids)}, '
+            f'избранного {self.count(FavoriteRecipeUser)}, '
+            f'в списках покупок {self.count(ShoppingCartUser)}, '
+            f'подписок {self.count(Follow)}. '
+            f'Пароль пользователей: {PASSWORD}'))
+
+    def count(self, model):
+        return model.objects.filter(
+            user__username__startswith=f'{PREFIX}_').count()
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'{PREFIX}_{number}',
+                    email=f'{PREFIX}_{number}@example.com',
+                    first_name='Синтетический',
+                    last_name=f'Пользователь {number}',
+                    password=password,
+                )
+                for number in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        return list(User.objects.filter(
+            username__startswith=f'{PREFIX}_').order_by('pk')
+            .values_list('pk', flat=True))
+
+    def create_recipes(self, user_ids, count, ingredient_ids, low, high,
+                       alpha):
+        if not default_storage.exists(IMAGE_NAME):
+            image = BytesIO()
+            Image.new('RGB', (640, 480), '#d08040').save(image, 'JPEG')
+            default_storage.save(IMAGE_NAME, ContentFile(image.getvalue()))
+        tag_ids = [
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color})[0].pk
+            for name, color, slug in TAGS
+        ]
+        authors = self.rng.choices(
+            user_ids, cum_weights=zipf_weights(len(user_ids), alpha),
+            k=count)
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    author_id=author_id,
+                    name=f'Синтетический рецепт {number}',
+                    image=IMAGE_NAME,
+                    text='Рецепт для нагрузочного тестирования.',
+                    cooking_time=self.rng.randint(5, 180),
+                )
+                for number, author_id in enumerate(authors)
+            ],
+            batch_size=self.batch_size,
+        )
+        recipes = list(
+            Recipe.objects.filter(author__username__startswith=f'{PREFIX}_')
+            .order_by('pk'))
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                minutes=self.rng.randint(0, 365 * 24 * 60))
+        Recipe.objects.bulk_update(
+            recipes, ['pub_date'], batch_size=self.batch_size)
+        RecipeTag.objects.bulk_create(
+            [
+                RecipeTag(recipe=recipe, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in self.rng.sample(
+                    tag_ids, self.rng.randint(1, len(tag_ids)))
+            ],
+            batch_size=self.batch_size,
+        )
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient_id in self.rng.sample(
+                    ingredient_ids, self.rng.randint(low, high))
+            ],
+            batch_size=self.batch_size,
+        )
+        return [recipe.pk for recipe in recipes]
+
+    def create_relations(self, user_ids, recipe_ids, alpha, options):
+        """
+        Избранное, списки покупок и подписки. И число связей у пользователя,
+        и популярность рецептов и авторов подчиняются степенному закону.
+        Рецепты не разосланы по лентам: лента находит их по подпискам.
+        """
+        recipes = recipe_ids[:]
+        self.rng.shuffle(recipes)
+        recipe_weights = zipf_weights(len(recipes), alpha)
+        authors = user_ids[:]
+        self.rng.shuffle(authors)
+        author_weights = zipf_weights(len(authors), alpha)
+        favorites, carts, follows = [], [], []
+        for user_id in user_ids:
+            for recipe_id in sample_distinct(
+                    self.rng, recipes, recipe_weights,
+                    power_law_size(self.rng, options['favorites'], 1.5,
+                                   len(recipes))):
+                favorites.append(
+                    FavoriteRecipeUser(user_id=user_id, recipe_id=recipe_id))
+            for recipe_id in sample_distinct(
+                    self.rng, recipes, recipe_weights,
+                    power_law_size(self.rng, options['carts'], 1.5,
+                                   len(recipes))):
+                carts.append(
+                    ShoppingCartUser(user_id=user_id, recipe_id=recipe_id))
+            for author_id in sample_distinct(
+                    self.rng, authors, author_weights,
+                    power_law_size(self.rng, options['follows'], 1.5,
+                                   len(authors) - 1),
+                    exclude=user_id):
+                follows.append(Follow(user_id=user_id, following_id=author_id))
+        for model, rows in ((FavoriteRecipeUser, favorites),
+                            (ShoppingCartUser, carts), (Follow, follows)):
+            model.objects.bulk_create(rows, batch_size=self.batch_size)
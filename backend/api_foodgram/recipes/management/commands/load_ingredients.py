@@ -0,0 +1,81 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Ingredient
+from recipes.signals import ingredients_loaded
+
+BATCH_SIZE = 500
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if len(row) != 2:
+                raise CommandError(f'Ожидались два столбца, получено: {row}')
+            yield row[0], row[1]
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as file:
+        for item in json.load(file):
+            yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def unique_ingredients(rows):
+    seen = set()
+    for name, measurement_unit in rows:
+        key = (name.strip(), measurement_unit.strip())
+        if key in seen or not all(key):
+            continue
+        seen.add(key)
+        yield Ingredient(name=key[0], measurement_unit=key[1])
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты из data/ingredients.csv или '
+            'data/ingredients.json. Повторный запуск ничего не дублирует.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument(
+            '--format', dest='file_format', choices=READERS,
+            help='По умолчанию определяется по расширению файла.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден.')
+        file_format = options['file_format'] or path.suffix.lstrip('.')
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат {file_format!r}, укажите --format.')
+        before = Ingredient.objects.count()
+        start = time.perf_counter()
+        ingredients = unique_ingredients(READERS[file_format](path))
+        processed = 0
+        while True:
+            batch = list(islice(ingredients, options['batch_size']))
+            if not batch:
+                break
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            processed += len(batch)
+            self.stdout.write(f'Обработано строк: {processed}')
+        elapsed = time.perf_counter() - start
+        created = Ingredient.objects.count() - before
+        if created:
+            ingredients_loaded.send(sender=Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {processed} уникальных строк, добавлено {created}, '
+            f'{processed / elapsed if elapsed else processed:.0f} строк/с.'))
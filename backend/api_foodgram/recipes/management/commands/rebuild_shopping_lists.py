@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import aggregate_shopping_lists, lock_shopping_lists
+
+BATCH_SIZE = 1000
+
+
+def expected_shopping_lists():
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in aggregate_shopping_lists()
+    }
+
+
+class Command(BaseCommand):
+    help = ('Сверяет позиции списков покупок с корзинами пользователей '
+            'и пересобирает их.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сверить, ничего не меняя.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        # Списки считаются и записываются в одной транзакции под
+        # блокировкой, чтобы параллельные изменения корзин не потерялись.
+        lock_shopping_lists()
+        if options['verify']:
+            self.verify(expected_shopping_lists())
+            return
+        ShoppingListItem.objects.all().delete()
+        expected = expected_shopping_lists()
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    total_amount=total,
+                )
+                for (user_id, ingredient_id), total in expected.items()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, позиций: {len(expected)}.'))
+
+    def verify(self, expected):
+        stored = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount')
+        }
+        mismatches = [
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        ]
+        for user_id, ingredient_id in mismatches[:20]:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'ожидается {expected.get((user_id, ingredient_id))}, '
+                f'в таблице {stored.get((user_id, ingredient_id))}')
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Расхождений нет, позиций: {len(stored)}.'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import COUNTERS
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики избранного, списков покупок и рецептов '
+            'авторов с таблицами и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сверить, ничего не меняя.')
+
+    def handle(self, *args, **options):
+        total = 0
+        for counter in COUNTERS:
+            drifted = list(counter.drifted().values_list('pk', flat=True))
+            total += len(drifted)
+            if not options['verify']:
+                for start in range(0, len(drifted), BATCH_SIZE):
+                    counter.model.objects.filter(
+                        pk__in=drifted[start:start + BATCH_SIZE]
+                    ).update(**{counter.field: counter.actual()})
+            self.stdout.write(
+                f'{counter.model._meta.model_name}.{counter.field}: '
+                f'расхождений {len(drifted)}')
+        if options['verify'] and total:
+            raise CommandError(f'Расхождений: {total}.')
+        self.stdout.write(self.style.SUCCESS(
+            'Счётчики сверены' if options['verify']
+            else f'Счётчики исправлены: {total}.'))
@@ -0,0 +1,41 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.scores import recipe_scores
+from recipes.signals import recipe_scores_updated
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает оценки популярности рецептов по счётчикам '
+            'избранного и списков покупок. Запускается по расписанию.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько рецептов обновлять одним запросом.')
+
+    def handle(self, *args, **options):
+        rows = Recipe.objects.order_by('pk').values_list(
+            'pk', 'favorites_count', 'in_carts_count', 'pub_date'
+        ).iterator(chunk_size=options['batch_size'])
+        scores = recipe_scores(rows)
+        updated = 0
+        while True:
+            batch = [
+                Recipe(
+                    pk=pk, popularity_score=popular, trending_score=trending)
+                for pk, popular, trending
+                in islice(scores, options['batch_size'])
+            ]
+            if not batch:
+                break
+            Recipe.objects.bulk_update(
+                batch, ['popularity_score', 'trending_score'])
+            updated += len(batch)
+        recipe_scores_updated.send(sender=Recipe)
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценки пересчитаны, рецептов: {updated}.'))
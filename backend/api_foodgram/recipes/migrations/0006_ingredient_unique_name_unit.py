@@ -0,0 +1,62 @@
+# Generated by Django 3.2 on 2026-10-18 20:17
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Переносит ссылки с дубликатов на ингредиент с наименьшим id."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1).order_by()
+    for group in duplicates:
+        keep_id = group['keep_id']
+        duplicate_ids = list(Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit'],
+        ).exclude(id=keep_id).values_list('id', flat=True))
+        for model, owner, amount in (
+            (RecipeIngredient, 'recipe_id', 'amount'),
+            (ShoppingListItem, 'user_id', 'total_amount'),
+        ):
+            for row in model.objects.filter(ingredient_id__in=duplicate_ids):
+                kept = model.objects.filter(
+                    ingredient_id=keep_id,
+                    **{owner: getattr(row, owner)},
+                ).first()
+                if kept is None:
+                    row.ingredient_id = keep_id
+                    row.save()
+                    continue
+                setattr(kept, amount, getattr(kept, amount)
+                        + getattr(row, amount))
+                kept.save()
+                row.delete()
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+    # Перенос ссылок фиксируется отдельной транзакцией до ALTER TABLE:
+    # в одной транзакции PostgreSQL отказывает с «pending trigger events»
+    # из-за отложенных проверок внешних ключей. Перенос можно повторить.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0005_recipe_pub_date_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop,
+            atomic=True,
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_measurement_unit'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2 on 2026-10-18 20:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_rows(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk')).order_by()
+            .values('recipe').annotate(total=Count('pk')).values('total'),
+            output_field=models.IntegerField(),
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=count_rows(
+            apps.get_model('recipes', 'FavoriteRecipeUser')),
+        in_carts_count=count_rows(
+            apps.get_model('recipes', 'ShoppingCartUser')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
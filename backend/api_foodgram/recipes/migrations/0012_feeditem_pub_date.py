@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-18 21:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_author_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feeditem',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата публикации рецепта'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('fanned_out', False)), fields=['author', '-pub_date', '-id'], name='recipe_not_fanned_out_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2026-10-18 21:10
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def fill_pub_date(apps, schema_editor):
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedItem.objects.update(pub_date=Subquery(
+        Recipe.objects.filter(pk=OuterRef('recipe')).values('pub_date')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_feeditem_pub_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_pub_date, migrations.RunPython.noop),
+    ]
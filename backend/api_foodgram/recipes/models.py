@@ -54,6 +54,12 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_ingredient_measurement_unit',
+                fields=['name', 'measurement_unit'],
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -93,6 +99,12 @@ class Recipe(models.Model):
         help_text='Загрузите ссылку на картинку к рецепту',
         upload_to='recipes',
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии картинки',
+    )
     text = models.TextField(
         max_length=1000,
         verbose_name='Описание рецепта',
@@ -116,11 +128,60 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок',
+    )
+    popularity_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность',
+    )
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность за последнее время',
+    )
+    fanned_out = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Разослан в ленты подписчиков',
+    )
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-popularity_score', '-id'],
+                name='recipe_popularity_id_idx',
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                name='recipe_trending_id_idx',
+            ),
+            # Рецепты без рассылки, которые лента читает по подпискам.
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_not_fanned_out_idx',
+                condition=models.Q(fanned_out=False),
+            ),
+        ]
 
     def __str__(self):
         return self.name[:15]
@@ -237,3 +298,67 @@ class FavoriteRecipeUser(models.Model):
                 fields=['user', 'recipe'],
             ),
         ]
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.IntegerField(
+        default=0,
+        verbose_name='Суммарное количество по рецептам из списка покупок',
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_user_ingredient_shoplist',
+                fields=['user', 'ingredient'],
+            ),
+        ]
+
+
+class FeedItem(models.Model):
+    """Рецепт в ленте подписок пользователя, записанный при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_feed_user_recipe',
+                fields=['user', 'recipe'],
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
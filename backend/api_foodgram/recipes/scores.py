@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+# Рецепт в списке покупок значит больше, чем в избранном: его готовят.
+CART_WEIGHT = 1.5
+POPULAR_HALF_LIFE_DAYS = 180
+TRENDING_GRAVITY = 1.5
+
+
+def interactions(favorites_count, in_carts_count):
+    return favorites_count + CART_WEIGHT * in_carts_count
+
+
+def popularity_score(favorites_count, in_carts_count, age):
+    """Добавления за всё время, вдвое слабее каждые полгода."""
+    return interactions(favorites_count, in_carts_count) * 0.5 ** (
+        age.total_seconds() / 86400 / POPULAR_HALF_LIFE_DAYS)
+
+
+def trending_score(favorites_count, in_carts_count, age):
+    """Добавления, быстро теряющие вес с возрастом рецепта."""
+    return interactions(favorites_count, in_carts_count) / (
+        age.total_seconds() / 3600 + 2) ** TRENDING_GRAVITY
+
+
+def recipe_scores(rows, now=None):
+    """(pk, popularity_score, trending_score) по строкам счётчиков рецептов."""
+    now = now or timezone.now()
+    for pk, favorites_count, in_carts_count, pub_date in rows:
+        age = max(now - pub_date, timedelta(0))
+        yield (
+            pk,
+            popularity_score(favorites_count, in_carts_count, age),
+            trending_score(favorites_count, in_carts_count, age),
+        )
@@ -0,0 +1,78 @@
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from recipes.models import RecipeIngredient, ShoppingCartUser, ShoppingListItem
+
+
+def recipe_amounts(recipe_id):
+    """Количество каждого ингредиента рецепта: {ingredient_id: amount}."""
+    return dict(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', 'amount'))
+
+
+@transaction.atomic
+def apply_shopping_list_delta(user_ids, delta):
+    """
+    Применяет изменения количеств к спискам покупок пользователей.
+
+    Недостающие позиции создаются, суммы меняются F()-выражением одним
+    UPDATE, обнулившиеся позиции удаляются.
+    """
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, amount in delta.items()
+            if amount > 0
+        ],
+        ignore_conflicts=True,
+    )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=delta
+    )
+    items.update(total_amount=F('total_amount') + Case(
+        *[When(ingredient_id=ingredient_id, then=Value(amount))
+          for ingredient_id, amount in delta.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+    items.filter(total_amount__lte=0).delete()
+
+
+def apply_recipe_delta(recipe_id, delta):
+    """Переносит изменение ингредиентов рецепта в списки покупок."""
+    user_ids = ShoppingCartUser.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True)
+    apply_shopping_list_delta(user_ids, delta)
+
+
+def aggregate_shopping_lists():
+    """Списки покупок всех пользователей, посчитанные по корзинам заново."""
+    return RecipeIngredient.objects.filter(
+        recipe__recipe_in_shoplist__isnull=False
+    ).values(
+        'ingredient_id',
+        user_id=F('recipe__recipe_in_shoplist__user'),
+    ).annotate(
+        total=Sum('amount'),
+    ).values_list('user_id', 'ingredient_id', 'total').order_by()
+
+
+def lock_shopping_lists():
+    """
+    Внутри транзакции запрещает изменять списки покупок до её конца.
+
+    Изменения корзин, зафиксированные раньше, будут видны следующему
+    запросу, а остальные подождут и применятся поверх. SQLite блокирует
+    запись во всю базу при первой записи в транзакции.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {ShoppingListItem._meta.db_table} '
+                'IN EXCLUSIVE MODE')
@@ -0,0 +1,148 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from recipes import deletions, feed
+from recipes.counters import COUNTERS_BY_ROWS
+from recipes.images import delete_image_variants
+from recipes.models import FavoriteRecipeUser, Recipe, ShoppingCartUser
+from recipes.shopping_list import (apply_recipe_delta,
+                                   apply_shopping_list_delta, recipe_amounts,)
+from users.models import Follow
+
+User = get_user_model()
+
+ingredients_loaded = Signal()
+# Отправляется с recipe и changes (recipes.changes.IngredientChanges).
+recipe_ingredients_changed = Signal()
+recipe_scores_updated = Signal()
+# Отправляется с recipe_id: update() не рассылает post_save.
+image_variants_built = Signal()
+
+
+@receiver(post_save, sender=ShoppingCartUser)
+def add_recipe_to_shopping_list(sender, instance, created, raw, **kwargs):
+    """При loaddata списки покупок собирает rebuild_shopping_lists."""
+    if created and not raw:
+        apply_shopping_list_delta(
+            [instance.user_id], recipe_amounts(instance.recipe_id)
+        )
+
+
+@receiver(post_delete, sender=ShoppingCartUser)
+def remove_recipe_from_shopping_list(sender, instance, **kwargs):
+    """
+    Вместе с рецептом списки покупок уменьшает prepare_recipe_deletion,
+    пока ингредиенты ещё не удалены каскадом, а вместе с пользователем
+    удаляется и его список.
+    """
+    if deletions.parents_deleted(instance):
+        return
+    apply_shopping_list_delta(
+        [instance.user_id], negative(recipe_amounts(instance.recipe_id)))
+
+
+def negative(amounts):
+    return {
+        ingredient_id: -amount for ingredient_id, amount in amounts.items()
+    }
+
+
+@receiver(recipe_ingredients_changed)
+def update_shopping_lists(sender, recipe, changes, **kwargs):
+    apply_recipe_delta(recipe.pk, changes.delta)
+
+
+@receiver(post_save, sender=FavoriteRecipeUser)
+@receiver(post_save, sender=ShoppingCartUser)
+@receiver(post_save, sender=Recipe)
+def increment_counter(sender, instance, created, raw, **kwargs):
+    """
+    При loaddata строки пользователей могут загрузиться после рецептов и
+    затереть счётчики, поэтому их пересчитывает reconcile_counters.
+    """
+    if created and not raw:
+        counter = COUNTERS_BY_ROWS[sender]
+        counter.change(getattr(instance, f'{counter.foreign_key}_id'), 1)
+
+
+@receiver(pre_delete, sender=FavoriteRecipeUser)
+@receiver(pre_delete, sender=ShoppingCartUser)
+def track_user_recipe_row(sender, instance, **kwargs):
+    deletions.track(
+        instance, (Recipe, instance.recipe_id), (User, instance.user_id))
+
+
+@receiver(pre_delete, sender=Recipe)
+def prepare_recipe_deletion(sender, instance, **kwargs):
+    """Рецепт убирается из списков покупок всех пользователей разом."""
+    deletions.track(instance, (User, instance.author_id))
+    user_ids = [
+        row.user_id
+        for row in deletions.parent_deleted(Recipe, instance.pk)
+        if isinstance(row, ShoppingCartUser)
+    ]
+    if user_ids:
+        apply_shopping_list_delta(
+            user_ids, negative(recipe_amounts(instance.pk)))
+
+
+@receiver(pre_delete, sender=User)
+def prepare_user_deletion(sender, instance, **kwargs):
+    """
+    Счётчики чужих рецептов, которые пользователь добавил в избранное и
+    списки покупок, уменьшаются одним запросом на каждый счётчик.
+    """
+    rows = deletions.parent_deleted(User, instance.pk)
+    for model in (FavoriteRecipeUser, ShoppingCartUser):
+        COUNTERS_BY_ROWS[model].change_many(
+            [
+                row.recipe_id for row in rows
+                if isinstance(row, model)
+                and not deletions.deleted_with(row, Recipe, row.recipe_id)
+            ],
+            -1,
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipeUser)
+@receiver(post_delete, sender=ShoppingCartUser)
+@receiver(post_delete, sender=Recipe)
+def decrement_counter(sender, instance, **kwargs):
+    """Счётчик удаляемого вместе со строкой объекта не трогается."""
+    deletions.forget(instance)
+    if deletions.parents_deleted(instance):
+        return
+    counter = COUNTERS_BY_ROWS[sender]
+    counter.change(getattr(instance, f'{counter.foreign_key}_id'), -1)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image_variants(sender, instance, **kwargs):
+    delete_image_variants(instance.image_variants)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        feed.backfill(instance.user_id, instance.following_id)
+
+
+@receiver(pre_delete, sender=Follow)
+def track_follow(sender, instance, **kwargs):
+    deletions.track(
+        instance, (User, instance.user_id), (User, instance.following_id))
+
+
+@receiver(post_delete, sender=Follow)
+def clear_feed(sender, instance, **kwargs):
+    """Ленты удаляемых пользователей удаляются каскадом целиком."""
+    deletions.forget(instance)
+    if not deletions.parents_deleted(instance):
+        feed.unfollow(instance.user_id, instance.following_id)
@@ -10,7 +10,9 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'password',
+        'recipes_count',
     )
+    readonly_fields = ('recipes_count',)
     search_fields = ('email', 'username',)
     list_filter = ('is_superuser',)
 
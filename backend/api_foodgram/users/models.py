@@ -31,6 +31,11 @@ class User(AbstractUser):
         verbose_name='Пароль',
         max_length=150,
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов',
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = [
@@ -0,0 +1,157 @@
+import base64
+from io import BytesIO
+
+import pytest
+from django.core.cache import cache
+from django.test import Client
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.instrumentation import collect_budget_violations
+from recipes.models import (Ingredient, Recipe, RecipeIngredient, RecipeTag,
+                            Tag,)
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def query_budgets():
+    """Тест падает, если действие API превысило бюджет запросов."""
+    with collect_budget_violations() as violations:
+        yield violations
+    if violations:
+        pytest.fail('\n'.join(violations))
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(settings):
+    # Тесты идут в одном процессе, локальный кеш у них общий.
+    settings.SHARED_CACHE = True
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.IMAGE_VARIANT_WORKERS = 0
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        first_name=username,
+        last_name=username,
+        password='password',
+    )
+
+
+def image_data():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), '#d08040').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()).decode()
+
+
+def recipe_payload(tags, ingredients, image=True):
+    payload = {
+        'tags': [tag.pk for tag in tags],
+        'ingredients': [
+            {'id': ingredient.pk, 'amount': number + 1}
+            for number, ingredient in enumerate(ingredients)
+        ],
+        'name': 'Рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+    }
+    if image:
+        payload['image'] = image_data()
+    return payload
+
+
+@pytest.fixture
+def user(db):
+    return create_user('user')
+
+
+@pytest.fixture
+def author(db):
+    return create_user('author')
+
+
+@pytest.fixture
+def admin_client(db):
+    admin = User.objects.create_superuser(
+        username='admin', email='admin@example.com', password='password')
+    client = Client()
+    client.force_login(admin)
+    return client
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+def token_client(owner):
+    token, _ = Token.objects.get_or_create(user=owner)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def user_client(user):
+    return token_client(user)
+
+
+@pytest.fixture
+def author_client(author):
+    return token_client(author)
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name='Завтрак', color='#008000', slug='breakfast'),
+        Tag.objects.create(name='Обед', color='#FFA500', slug='lunch'),
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('мука', 'сахар', 'соль', 'масло')
+    ]
+
+
+@pytest.fixture
+def make_recipes(author, tags, ingredients):
+    """Создаёт рецепты автора со всеми тегами и ингредиентами."""
+    def make(count, recipe_author=None):
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=recipe_author or author,
+                name=f'Рецепт {number}',
+                image='recipes/test.jpg',
+                text='Описание',
+                cooking_time=10,
+            )
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe=recipe, tag=tag) for tag in tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1)
+                for ingredient in ingredients
+            )
+            recipes.append(recipe)
+        return recipes
+    return make
@@ -0,0 +1,47 @@
+"""
+Отозванный токен не принимается со следующего запроса.
+
+Тесты транзакционные, чтобы смена версии токена в on_commit прошла
+как на сервере, и идут с общим кешем и без него: LRU процесса может
+держать запись отозванного токена.
+"""
+import pytest
+
+pytestmark = [
+    pytest.mark.django_db(transaction=True),
+    pytest.mark.parametrize('shared_cache', [True, False], indirect=True),
+]
+
+ME_URL = '/api/users/me/'
+
+
+@pytest.fixture
+def shared_cache(request, settings):
+    settings.SHARED_CACHE = request.param
+
+
+@pytest.fixture
+def authenticated(user_client):
+    for _ in range(2):
+        assert user_client.get(ME_URL).status_code == 200
+    return user_client
+
+
+def test_logout(authenticated):
+    response = authenticated.post('/api/auth/token/logout/')
+    assert response.status_code == 204
+    assert authenticated.get(ME_URL).status_code == 401
+
+
+def test_set_password(authenticated):
+    response = authenticated.post(
+        '/api/users/set_password/',
+        {'current_password': 'password', 'new_password': 'Nn-12345678'})
+    assert response.status_code == 204
+    assert authenticated.get(ME_URL).status_code == 401
+
+
+def test_deactivation(user, authenticated):
+    user.is_active = False
+    user.save()
+    assert authenticated.get(ME_URL).status_code == 401
@@ -0,0 +1,95 @@
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import (FavoriteRecipeUser, RecipeIngredient,
+                            ShoppingCartUser,)
+from users.models import Follow
+
+RECIPES_URL = '/api/recipes/?limit=6'
+
+
+def test_tests_use_locmem_cache():
+    assert settings.CACHES['default']['BACKEND'] == (
+        'django.core.cache.backends.locmem.LocMemCache')
+
+
+def get_recipes(client):
+    response = client.get(RECIPES_URL)
+    assert response.status_code == 200
+    return response
+
+
+def test_response_is_cached(user_client, make_recipes):
+    make_recipes(2)
+    assert get_recipes(user_client)['X-Cache'] == 'MISS'
+    assert get_recipes(user_client)['X-Cache'] == 'HIT'
+
+
+def test_recipe_change_invalidates_anonymous_response(
+        client, make_recipes, django_capture_on_commit_callbacks):
+    recipe = make_recipes(1)[0]
+    get_recipes(client)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.name = 'Новое название'
+        recipe.save()
+    response = get_recipes(client)
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['results'][0]['name'] == 'Новое название'
+
+
+def test_ingredient_change_invalidates_response(
+        user_client, make_recipes, django_capture_on_commit_callbacks):
+    recipe = make_recipes(1)[0]
+    get_recipes(user_client)
+    with django_capture_on_commit_callbacks(execute=True):
+        RecipeIngredient.objects.filter(recipe=recipe).first().delete()
+    response = get_recipes(user_client)
+    assert response['X-Cache'] == 'MISS'
+    assert len(response.json()['results'][0]['ingredients']) == 3
+
+
+@pytest.mark.parametrize('model, flag', [
+    (FavoriteRecipeUser, 'is_favorited'),
+    (ShoppingCartUser, 'is_in_shopping_cart'),
+])
+def test_user_relation_invalidates_own_response(
+        model, flag, user, user_client, client, make_recipes,
+        django_capture_on_commit_callbacks):
+    recipe = make_recipes(1)[0]
+    get_recipes(user_client)
+    get_recipes(client)
+    with django_capture_on_commit_callbacks(execute=True):
+        model.objects.create(user=user, recipe=recipe)
+    response = get_recipes(user_client)
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['results'][0][flag] is True
+    assert get_recipes(client)['X-Cache'] == 'HIT'
+
+
+def test_follow_invalidates_subscriptions(
+        user, author, user_client, make_recipes,
+        django_capture_on_commit_callbacks):
+    make_recipes(1)
+    url = '/api/users/subscriptions/?limit=6'
+    assert user_client.get(url).json()['count'] == 0
+    with django_capture_on_commit_callbacks(execute=True):
+        Follow.objects.create(user=user, following=author)
+    response = user_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['count'] == 1
+
+
+def test_caches_disabled_without_shared_cache(
+        settings, user_client, make_recipes):
+    settings.SHARED_CACHE = False
+    make_recipes(2)
+    queries = []
+    for _ in range(2):
+        with CaptureQueriesContext(connection) as context:
+            response = get_recipes(user_client)
+        assert 'X-Cache' not in response
+        assert 'ETag' not in response
+        queries.append(len(context))
+    assert queries[0] == queries[1]
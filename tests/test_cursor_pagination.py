@@ -0,0 +1,85 @@
+"""
+Постраничный вывод по курсору (?pagination=cursor) проходит все записи
+без повторов и пропусков, даже когда значения сортировки совпадают.
+"""
+import pytest
+from django.utils import timezone
+
+from recipes.models import Recipe
+from users.models import Follow
+
+from .conftest import create_user
+
+RECIPES_URL = '/api/recipes/?pagination=cursor&limit=3'
+SCORES = (2, 1, 1, 1, 1, 0, 0, 2)
+
+
+def walk(client, url):
+    """id записей всех страниц, пройденных по ссылкам next."""
+    pages = []
+    while url is not None:
+        response = client.get(url)
+        assert response.status_code == 200
+        data = response.json()
+        assert 'count' not in data
+        pages.append(data['results'])
+        url = data['next']
+    return pages
+
+
+def ids(pages):
+    return [item['id'] for page in pages for item in page]
+
+
+@pytest.fixture
+def tied_recipes(make_recipes):
+    """Рецепты с одинаковой датой и повторяющимися оценками."""
+    recipes = make_recipes(len(SCORES))
+    pub_date = timezone.now()
+    for recipe, score in zip(recipes, SCORES):
+        recipe.pub_date = pub_date
+        recipe.popularity_score = score
+        recipe.trending_score = -score
+    Recipe.objects.bulk_update(
+        recipes, ['pub_date', 'popularity_score', 'trending_score'])
+    return recipes
+
+
+@pytest.mark.parametrize('ordering, key', [
+    ('', lambda recipe: (recipe.pub_date, recipe.pk)),
+    ('&ordering=popular', lambda recipe: (recipe.popularity_score,
+                                          recipe.pk)),
+    ('&ordering=trending', lambda recipe: (recipe.trending_score,
+                                           recipe.pk)),
+], ids=['default', 'popular', 'trending'])
+def test_cursor_walks_all_recipes(ordering, key, user_client, tied_recipes):
+    pages = walk(user_client, RECIPES_URL + ordering)
+    assert len(pages) == 3
+    expected = sorted(Recipe.objects.all(), key=key, reverse=True)
+    assert ids(pages) == [recipe.pk for recipe in expected]
+
+
+def test_subscriptions_cursor(user, user_client, make_recipes):
+    for number in range(5):
+        author = create_user(f'author{number}')
+        make_recipes(3, recipe_author=author)
+        Follow.objects.create(user=user, following=author)
+    pages = walk(
+        user_client,
+        '/api/users/subscriptions/?pagination=cursor&limit=2'
+        '&recipes_limit=1')
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [item['username'] for page in pages for item in page] == [
+        f'author{number}' for number in range(5)]
+    for page in pages:
+        for item in page:
+            assert len(item['recipes']) == 1
+            assert item['recipes_count'] == 3
+
+
+@pytest.mark.parametrize('url', [
+    '/api/recipes/?pagination=cursor&cursor=invalid',
+    '/api/users/subscriptions/?pagination=cursor&cursor=invalid',
+])
+def test_invalid_cursor(url, user_client):
+    assert user_client.get(url).status_code == 404
@@ -0,0 +1,80 @@
+"""
+Каскадное удаление рецепта или пользователя обновляет счётчики и списки
+покупок постоянным числом запросов, а не запросом на каждую строку.
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import FavoriteRecipeUser, Recipe, ShoppingCartUser
+
+from .conftest import create_user
+
+SIZES = [1, 5]
+
+
+def fill(recipe, size, *models):
+    for number in range(size):
+        user = create_user(f'reader{recipe.pk}_{number}')
+        for model in models:
+            model.objects.create(user=user, recipe=recipe)
+
+
+def count_queries(func):
+    with CaptureQueriesContext(connection) as context:
+        func()
+    return len(context.captured_queries)
+
+
+def test_recipe_deletion_queries_do_not_grow(make_recipes):
+    small, large = make_recipes(2)
+    fill(small, SIZES[0], FavoriteRecipeUser, ShoppingCartUser)
+    fill(large, SIZES[1], FavoriteRecipeUser, ShoppingCartUser)
+    assert count_queries(small.delete) == count_queries(large.delete)
+
+
+def test_recipe_deletion_updates_author_counter(author, make_recipes):
+    recipe = make_recipes(2)[0]
+    fill(recipe, 3, FavoriteRecipeUser, ShoppingCartUser)
+    recipe.delete()
+    author.refresh_from_db()
+    assert author.recipes_count == 1
+
+
+@pytest.mark.parametrize('model, field', [
+    (FavoriteRecipeUser, 'favorites_count'),
+    (ShoppingCartUser, 'in_carts_count'),
+])
+def test_user_deletion_updates_counters(model, field, make_recipes):
+    recipes = make_recipes(3)
+    reader = create_user('reader')
+    other = create_user('other')
+    for recipe in recipes:
+        model.objects.create(user=reader, recipe=recipe)
+        model.objects.create(user=other, recipe=recipe)
+    reader.delete()
+    assert set(Recipe.objects.values_list(field, flat=True)) == {1}
+
+
+def test_user_deletion_queries_do_not_grow(make_recipes):
+    recipes = make_recipes(SIZES[1])
+    small, large = create_user('small'), create_user('large')
+    for user, size in ((small, SIZES[0]), (large, SIZES[1])):
+        for recipe in recipes[:size]:
+            FavoriteRecipeUser.objects.create(user=user, recipe=recipe)
+            ShoppingCartUser.objects.create(user=user, recipe=recipe)
+    assert count_queries(small.delete) == count_queries(large.delete)
+
+
+def test_author_deletion_removes_counters_of_own_recipes(
+        author, make_recipes):
+    own = make_recipes(2)
+    other_author = create_user('other_author')
+    other = make_recipes(1, recipe_author=other_author)[0]
+    for recipe in own + [other]:
+        FavoriteRecipeUser.objects.create(user=author, recipe=recipe)
+    author.delete()
+    other.refresh_from_db()
+    other_author.refresh_from_db()
+    assert other.favorites_count == 0
+    assert other_author.recipes_count == 1
@@ -0,0 +1,83 @@
+"""
+Фильтры и сортировки списка рецептов и лента читают таблицы по индексам.
+
+На PostgreSQL последовательное сканирование отключается: на маленьких
+тестовых таблицах планировщик иначе всегда выбирает Seq Scan.
+"""
+import pytest
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from api.filters import CustomRecipeFilterSet
+from api.views import recipes_for_user
+from recipes.models import FavoriteRecipeUser, FeedItem, ShoppingCartUser
+
+# Индексы уникальных ограничений SQLite называет по таблице.
+UNIQUE_INDEXES = {
+    'recipetag': ('unique_tag_recipe',
+                  'sqlite_autoindex_recipes_recipetag_1'),
+    'favorite': ('unique_favorite_recipe_user',
+                 'sqlite_autoindex_recipes_favoriterecipeuser_1'),
+    'cart': ('unique_user_shoplist',
+             'sqlite_autoindex_recipes_shoppingcartuser_1'),
+}
+
+
+def unique_index(name):
+    postgres, sqlite = UNIQUE_INDEXES[name]
+    return postgres if connection.vendor == 'postgresql' else sqlite
+
+
+def explain(queryset):
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+@pytest.fixture
+def filtered(user, author, tags, make_recipes):
+    for recipe in make_recipes(3):
+        FavoriteRecipeUser.objects.create(user=user, recipe=recipe)
+        ShoppingCartUser.objects.create(user=user, recipe=recipe)
+    request = RequestFactory().get('/api/recipes/')
+    request.user = user
+
+    def queryset(**params):
+        filterset = CustomRecipeFilterSet(
+            params, queryset=recipes_for_user(user), request=request)
+        assert filterset.is_valid(), filterset.errors
+        return filterset.qs.order_by(
+            *filterset.qs.query.order_by or ('-pub_date', '-id'))[:6]
+    return queryset
+
+
+def test_author_filter_uses_index(filtered, author):
+    plan = explain(filtered(author=[author.pk]))
+    assert 'recipe_author_pub_date_idx' in plan
+
+
+@pytest.mark.parametrize('params, index', [
+    ({'tags': ['breakfast', 'lunch']}, 'recipetag'),
+    ({'is_favorited': 'true'}, 'favorite'),
+    ({'is_in_shopping_cart': 'true'}, 'cart'),
+])
+def test_relation_filter_uses_unique_index(params, index, filtered):
+    assert unique_index(index) in explain(filtered(**params))
+
+
+@pytest.mark.parametrize('ordering, index', [
+    ('popular', 'recipe_popularity_id_idx'),
+    ('trending', 'recipe_trending_id_idx'),
+])
+def test_ordering_uses_index(ordering, index, filtered):
+    assert index in explain(filtered(ordering=ordering))
+
+
+def test_feed_uses_index(user):
+    plan = explain(
+        FeedItem.objects.filter(user=user)
+        .order_by('-pub_date', '-recipe_id')
+        .values_list('pub_date', 'recipe_id')[:7])
+    assert 'feed_user_pub_date_idx' in plan
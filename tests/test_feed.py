@@ -0,0 +1,60 @@
+import pytest
+from django.core.cache import cache
+
+from recipes.models import FeedItem
+from users.models import Follow
+
+from .conftest import create_user
+
+FEED_URL = '/api/recipes/feed/?limit=2'
+
+
+@pytest.fixture
+def feed(settings, user, make_recipes):
+    """
+    Рецепты двух авторов вперемешку: первого рассылают по лентам, у
+    второго подписчиков больше FEED_FANOUT_LIMIT.
+    """
+    settings.FEED_FANOUT_LIMIT = 1
+    fanned_out, popular = create_user('fanned_out'), create_user('popular')
+    Follow.objects.create(user=user, following=fanned_out)
+    Follow.objects.create(user=user, following=popular)
+    Follow.objects.create(user=create_user('other'), following=popular)
+    recipes = []
+    for number in range(3):
+        recipes += make_recipes(1, recipe_author=fanned_out)
+        recipes += make_recipes(1, recipe_author=popular)
+    make_recipes(1)
+    return [recipe.pk for recipe in reversed(recipes)]
+
+
+def read_feed(client):
+    ids, url = [], FEED_URL
+    while url:
+        cache.clear()
+        data = client.get(url).json()
+        ids += [recipe['id'] for recipe in data['results']]
+        url = data['next']
+    return ids
+
+
+def test_feed_merges_fanned_out_and_followed_authors(user, user_client, feed):
+    assert FeedItem.objects.filter(user=user).count() == 3
+    assert read_feed(user_client) == feed
+
+
+def test_feed_page_queries(user_client, feed, django_assert_num_queries):
+    url = user_client.get(FEED_URL).json()['next']
+    cache.clear()
+    with django_assert_num_queries(8):
+        assert user_client.get(url).status_code == 200
+
+
+def test_feed_invalid_cursor(user_client, feed):
+    assert user_client.get(f'{FEED_URL}&cursor=bad').status_code == 404
+
+
+def test_unfollow_clears_feed(user, user_client, feed):
+    Follow.objects.filter(user=user).delete()
+    assert not FeedItem.objects.filter(user=user).exists()
+    assert read_feed(user_client) == []
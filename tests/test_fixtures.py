@@ -0,0 +1,22 @@
+"""Установка по README: фикстуры, затем пересчёт счётчиков и списков."""
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+
+from recipes.models import ShoppingCartUser, ShoppingListItem
+from users.models import User
+
+
+def test_fixture_load_and_reconcile(db):
+    call_command(
+        'loaddata', settings.BASE_DIR / 'fixtures.json',
+        exclude=['auth.permission', 'contenttypes'], stdout=StringIO())
+    assert ShoppingCartUser.objects.exists()
+    assert not ShoppingListItem.objects.exists()
+    for command in ('reconcile_counters', 'rebuild_shopping_lists'):
+        call_command(command, stdout=StringIO())
+        call_command(command, verify=True, stdout=StringIO())
+    assert sorted(User.objects.values_list('recipes_count', flat=True)) == [
+        1, 2, 3]
+    assert ShoppingListItem.objects.exists()
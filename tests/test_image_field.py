@@ -0,0 +1,102 @@
+import base64
+import os
+import textwrap
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from rest_framework import serializers
+
+from api.fields import StreamingBase64ImageField
+
+from .conftest import recipe_payload
+
+
+def png_base64(image=None, image_format='PNG'):
+    if image is None:
+        image = Image.new('RGB', (64, 64), '#d08040')
+    buffer = BytesIO()
+    image.save(buffer, image_format)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.mark.parametrize('separator', ['\n', '\r\n'])
+def test_wrapped_base64_is_accepted(separator):
+    data = separator.join(textwrap.wrap(png_base64(), 76))
+    image = StreamingBase64ImageField().to_internal_value(
+        f'data:image/png;base64,{data}')
+    assert image.name.endswith('.png')
+
+
+def test_invalid_base64_is_rejected():
+    with pytest.raises(serializers.ValidationError):
+        StreamingBase64ImageField().to_internal_value(
+            'data:image/png;base64,' + png_base64()[:-3] + '!!!')
+
+
+def fail(*args, **kwargs):
+    raise AssertionError('Pillow не должен читать отклонённую картинку')
+
+
+@pytest.fixture
+def no_decoding(monkeypatch):
+    """Pillow может прочитать только заголовок картинки."""
+    def forbid():
+        monkeypatch.setattr(Image.Image, 'load', fail)
+        monkeypatch.setattr(Image.Image, 'verify', fail)
+    return forbid
+
+
+@pytest.fixture
+def no_pillow(monkeypatch):
+    def forbid():
+        monkeypatch.setattr(Image, 'open', fail)
+    return forbid
+
+
+def post_image(client, tags, ingredients, image, forbid):
+    payload = recipe_payload(tags, ingredients)
+    payload['image'] = image
+    forbid()
+    response = client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 400
+    return response.json()['image']
+
+
+def test_oversize_input_is_rejected(settings, user_client, tags,
+                                    ingredients, no_pillow):
+    settings.RECIPE_IMAGE_MAX_SIZE = 1000
+    noise = Image.frombytes('RGB', (64, 64), os.urandom(64 * 64 * 3))
+    errors = post_image(user_client, tags, ingredients,
+                        'data:image/png;base64,' + png_base64(noise),
+                        no_pillow)
+    assert errors == ['Картинка больше 1000 байт']
+
+
+def test_oversize_input_is_rejected_while_decoding(settings, no_pillow):
+    settings.RECIPE_IMAGE_MAX_SIZE = 1000
+    data = base64.b64encode(b'\x89PNG\r\n\x1a\n' + os.urandom(1042))
+    field = StreamingBase64ImageField()
+    assert len(data) <= field.max_encoded_length()
+    no_pillow()
+    with pytest.raises(serializers.ValidationError) as error:
+        field.to_internal_value(data.decode())
+    assert error.value.detail == ['Картинка больше 1000 байт']
+
+
+def test_oversize_dimensions_are_rejected(settings, user_client, tags,
+                                          ingredients, no_decoding):
+    settings.RECIPE_IMAGE_MAX_SIDE = 32
+    errors = post_image(user_client, tags, ingredients,
+                        'data:image/png;base64,' + png_base64(),
+                        no_decoding)
+    assert errors == ['Картинка больше 32x32 пикселей']
+
+
+def test_unsupported_format_is_rejected(user_client, tags, ingredients,
+                                        no_pillow):
+    image = Image.new('RGB', (64, 64), '#d08040')
+    errors = post_image(user_client, tags, ingredients,
+                        'data:image/bmp;base64,' + png_base64(image, 'BMP'),
+                        no_pillow)
+    assert errors == [StreamingBase64ImageField.INVALID_TYPE_MESSAGE]
@@ -0,0 +1,92 @@
+"""Файлы уменьшенных копий удаляются вместе с картинкой и рецептом."""
+import pytest
+from django.core.files.storage import default_storage
+
+from api.versions import get_version, recipe_version_name
+from recipes.images import build_image_variants
+from recipes.models import Recipe
+
+from .conftest import recipe_payload
+
+
+@pytest.fixture
+def recipe(author_client, tags, ingredients,
+           django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(
+            '/api/recipes/', recipe_payload(tags, ingredients), format='json')
+    assert response.status_code == 201
+    recipe = Recipe.objects.get(pk=response.json()['id'])
+    assert recipe.image_variants
+    return recipe
+
+
+def files_exist(variants):
+    return [default_storage.exists(name) for name in variants.values()]
+
+
+def test_replaced_image_variants_are_deleted(
+        recipe, author_client, tags, ingredients,
+        django_capture_on_commit_callbacks):
+    old = recipe.image_variants
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.put(
+            f'/api/recipes/{recipe.pk}/', recipe_payload(tags, ingredients),
+            format='json')
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    assert not any(files_exist(old))
+    assert recipe.image_variants.keys() == old.keys()
+    assert all(files_exist(recipe.image_variants))
+
+
+def test_variants_kept_without_new_image(
+        recipe, author_client, tags, ingredients,
+        django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.patch(
+            f'/api/recipes/{recipe.pk}/',
+            recipe_payload(tags, ingredients, image=False), format='json')
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    assert recipe.image_variants
+    assert all(files_exist(recipe.image_variants))
+
+
+def test_deleted_recipe_variants_are_deleted(
+        recipe, author_client, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.delete(f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == 204
+    assert not any(files_exist(recipe.image_variants))
+
+
+def test_variants_kept_when_deletion_rolls_back(
+        recipe, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks() as callbacks:
+        recipe.delete()
+    assert callbacks
+    assert all(files_exist(recipe.image_variants))
+
+
+def test_variants_for_replaced_image_are_discarded(
+        recipe, django_capture_on_commit_callbacks):
+    old_image = recipe.image.name
+    variants = recipe.image_variants
+    Recipe.objects.filter(pk=recipe.pk).update(image='recipes/new.jpg')
+    with django_capture_on_commit_callbacks(execute=True):
+        build_image_variants(recipe.pk, old_image)
+    recipe.refresh_from_db()
+    assert recipe.image_variants == variants
+    assert sorted(default_storage.listdir('recipes/variants')[1]) == sorted(
+        name.rsplit('/', 1)[1] for name in variants.values())
+
+
+def test_built_variants_invalidate_recipe(
+        recipe, django_capture_on_commit_callbacks):
+    version = get_version(recipe_version_name(recipe.pk))
+    with django_capture_on_commit_callbacks(execute=True):
+        build_image_variants(recipe.pk, recipe.image.name)
+    assert get_version(recipe_version_name(recipe.pk)) != version
+    recipe.refresh_from_db()
+    assert all(files_exist(recipe.image_variants))
@@ -0,0 +1,101 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from api.versions import INGREDIENTS_VERSION, get_version
+from recipes.models import Ingredient
+from recipes.signals import ingredients_loaded
+
+NAMES = ('Мука пшеничная', 'Рисовая мука', 'Сахар', 'мускатный орех')
+
+
+@pytest.fixture
+def catalog(db):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='г') for name in NAMES)
+
+
+def search(client, term):
+    response = client.get('/api/ingredients/', {'name': term})
+    assert response.status_code == 200
+    return [item['name'] for item in response.json()]
+
+
+def test_search_prefix_before_substring(client, catalog):
+    assert search(client, 'МУ') == [
+        'Мука пшеничная', 'мускатный орех', 'Рисовая мука']
+
+
+def test_search_without_matches(client, catalog):
+    assert search(client, 'соль') == []
+
+
+def test_list_without_search(client, catalog):
+    assert len(client.get('/api/ingredients/').json()) == len(NAMES)
+
+
+def test_search_queries(client, catalog, django_assert_num_queries):
+    search(client, 'му')
+    with django_assert_num_queries(1):
+        search(client, 'сах')
+
+
+def test_search_without_shared_cache(settings, client, catalog):
+    settings.SHARED_CACHE = False
+    assert search(client, 'МУ') == [
+        'Мука пшеничная', 'мускатный орех', 'Рисовая мука']
+    ingredient = Ingredient.objects.get(name='Сахар')
+    response = client.get(f'/api/ingredients/{ingredient.pk}/')
+    assert response.json()['name'] == 'Сахар'
+
+
+@pytest.fixture
+def ingredient_files(tmp_path):
+    csv_path = tmp_path / 'ingredients.csv'
+    csv_path.write_text(
+        'мука,г\nсахар,г\n мука , г\nсахар,кг\n', encoding='utf-8')
+    json_path = tmp_path / 'ingredients.json'
+    json_path.write_text(json.dumps([
+        {'name': 'соль', 'measurement_unit': 'г'},
+        {'name': 'соль', 'measurement_unit': 'г'},
+        {'name': 'мука', 'measurement_unit': 'г'},
+    ], ensure_ascii=False), encoding='utf-8')
+    return csv_path, json_path
+
+
+def load(path):
+    call_command('load_ingredients', path, stdout=StringIO())
+
+
+def test_load_ingredients_twice(db, client, ingredient_files,
+                                django_capture_on_commit_callbacks):
+    csv_path, json_path = ingredient_files
+    sent = []
+
+    def receiver(sender, **kwargs):
+        sent.append(sender)
+
+    ingredients_loaded.connect(receiver)
+    try:
+        assert client.get('/api/ingredients/').json() == []
+        version = get_version(INGREDIENTS_VERSION)
+        with django_capture_on_commit_callbacks(execute=True):
+            load(csv_path)
+            load(json_path)
+        assert len(sent) == 2
+        assert get_version(INGREDIENTS_VERSION) != version
+        assert sorted(Ingredient.objects.values_list(
+            'name', 'measurement_unit')) == [
+            ('мука', 'г'), ('сахар', 'г'), ('сахар', 'кг'), ('соль', 'г')]
+        assert len(client.get('/api/ingredients/').json()) == 4
+        version = get_version(INGREDIENTS_VERSION)
+        with django_capture_on_commit_callbacks(execute=True):
+            load(csv_path)
+            load(json_path)
+        assert Ingredient.objects.count() == 4
+        assert len(sent) == 2
+        assert get_version(INGREDIENTS_VERSION) == version
+    finally:
+        ingredients_loaded.disconnect(receiver)
@@ -0,0 +1,49 @@
+import pytest
+
+METRICS_URL = '/metrics'
+
+
+def test_metrics_after_api_request(client, make_recipes):
+    make_recipes(1)
+    for _ in range(2):
+        assert client.get('/api/recipes/?limit=6').status_code == 200
+    response = client.get(METRICS_URL)
+    assert response.status_code == 200
+    content = response.content.decode()
+    view = 'view="RecipeViewSet.list"'
+    assert any(
+        line.startswith('foodgram_http_requests_total{')
+        and view in line and 'status="200"' in line
+        for line in content.splitlines())
+    assert f'foodgram_http_request_duration_seconds_count{{{view}}}' in (
+        content)
+    for outcome in ('hit', 'miss'):
+        assert any(
+            line.startswith('foodgram_response_cache_total{')
+            and 'name="recipes-list"' in line
+            and f'outcome="{outcome}"' in line
+            for line in content.splitlines())
+
+
+@pytest.mark.parametrize('headers, status', [
+    ({}, 403),
+    ({'HTTP_AUTHORIZATION': 'Bearer wrong'}, 403),
+    ({'HTTP_AUTHORIZATION': 'Bearer secret'}, 200),
+])
+def test_metrics_from_other_address(settings, client, headers, status):
+    settings.METRICS_TOKEN = 'secret'
+    response = client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5', **headers)
+    assert response.status_code == status
+
+
+def test_metrics_allowed_network(settings, client):
+    settings.METRICS_ALLOWED_IPS = ['10.0.0.0/8']
+    assert client.get(METRICS_URL, REMOTE_ADDR='10.1.2.3').status_code == 200
+    assert client.get(METRICS_URL).status_code == 403
+
+
+def test_metrics_without_token_setting(settings, client):
+    settings.METRICS_TOKEN = ''
+    response = client.get(
+        METRICS_URL, REMOTE_ADDR='203.0.113.5', HTTP_AUTHORIZATION='Bearer ')
+    assert response.status_code == 403
@@ -0,0 +1,46 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+BEFORE = [
+    ('recipes', '0005_recipe_pub_date_id_index'),
+    ('users', '0001_initial'),
+]
+AFTER = [('recipes', '0006_ingredient_unique_name_unit')]
+
+
+def migrate(targets):
+    executor = MigrationExecutor(connection)
+    executor.loader.build_graph()
+    executor.migrate(targets)
+    return executor.loader.project_state(targets).apps
+
+
+@pytest.mark.django_db(transaction=True)
+def test_duplicate_ingredients_are_merged():
+    apps = migrate(BEFORE)
+    try:
+        User = apps.get_model('users', 'User')
+        Ingredient = apps.get_model('recipes', 'Ingredient')
+        Recipe = apps.get_model('recipes', 'Recipe')
+        RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+        author = User.objects.create(
+            username='author', email='author@example.com')
+        kept, duplicate = [
+            Ingredient.objects.create(name='соль', measurement_unit='г')
+            for _ in range(2)
+        ]
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', image='recipes/test.jpg',
+            text='Описание', cooking_time=1)
+        for ingredient, amount in ((kept, 2), (duplicate, 3)):
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount)
+        apps = migrate(AFTER)
+        Ingredient = apps.get_model('recipes', 'Ingredient')
+        RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+        assert list(Ingredient.objects.values_list('pk', flat=True)) == [
+            kept.pk]
+        assert RecipeIngredient.objects.get().amount == 5
+    finally:
+        migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
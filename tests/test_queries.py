@@ -0,0 +1,104 @@
+"""
+Число SQL-запросов основных эндпоинтов не зависит от объёма данных.
+
+Каждый запрос выполняется с пустым кешем: так считаются запросы, которые
+реально уходят в БД при промахе кеша ответов и фрагментов.
+"""
+import pytest
+from django.core.cache import cache
+
+from recipes.models import FavoriteRecipeUser, ShoppingCartUser
+from users.models import Follow
+
+from .conftest import create_user
+
+SIZES = [1, 5]
+
+
+def cold_request(method, *args, **kwargs):
+    cache.clear()
+    return method(*args, **kwargs)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_recipe_list_anonymous(size, client, make_recipes,
+                               django_assert_num_queries):
+    make_recipes(size)
+    with django_assert_num_queries(6):
+        response = cold_request(client.get, '/api/recipes/?limit=6')
+    assert response.status_code == 200
+    assert response.json()['count'] == size
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_recipe_list(size, user, user_client, make_recipes,
+                     django_assert_num_queries):
+    recipes = make_recipes(size)
+    FavoriteRecipeUser.objects.create(user=user, recipe=recipes[0])
+    with django_assert_num_queries(7):
+        response = cold_request(user_client.get, '/api/recipes/?limit=6')
+    assert response.status_code == 200
+    assert response.json()['results'][-1]['is_favorited'] is True
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_recipe_retrieve(size, user_client, make_recipes,
+                         django_assert_num_queries):
+    recipe = make_recipes(size)[0]
+    with django_assert_num_queries(6):
+        response = cold_request(user_client.get, f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == 200
+    assert len(response.json()['ingredients']) == 4
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_subscriptions(size, user, user_client, make_recipes,
+                       django_assert_num_queries):
+    for number in range(size):
+        author = create_user(f'author{number}')
+        make_recipes(size, recipe_author=author)
+        Follow.objects.create(user=user, following=author)
+    with django_assert_num_queries(4):
+        response = cold_request(
+            user_client.get, '/api/users/subscriptions/?limit=6&recipes_limit=2')
+    assert response.status_code == 200
+    assert response.json()['count'] == size
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_favorite(size, user, user_client, make_recipes,
+                  django_assert_num_queries):
+    recipe = make_recipes(size)[0]
+    url = f'/api/recipes/{recipe.pk}/favorite/'
+    with django_assert_num_queries(7):
+        assert cold_request(user_client.post, url).status_code == 201
+    with django_assert_num_queries(8):
+        assert cold_request(user_client.delete, url).status_code == 204
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 0
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_shopping_cart(size, user, user_client, make_recipes,
+                       django_assert_num_queries):
+    recipes = make_recipes(size)
+    for recipe in recipes[1:]:
+        ShoppingCartUser.objects.create(user=user, recipe=recipe)
+    url = f'/api/recipes/{recipes[0].pk}/shopping_cart/'
+    with django_assert_num_queries(13):
+        assert cold_request(user_client.post, url).status_code == 201
+    with django_assert_num_queries(13):
+        assert cold_request(user_client.delete, url).status_code == 204
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_download_shopping_cart(size, user, user_client, make_recipes,
+                                django_assert_num_queries):
+    for recipe in make_recipes(size):
+        ShoppingCartUser.objects.create(user=user, recipe=recipe)
+    with django_assert_num_queries(2):
+        response = cold_request(
+            user_client.get, '/api/recipes/download_shopping_cart/')
+        content = b''.join(response.streaming_content).decode()
+    assert response.status_code == 200
+    assert f'мука (г) — {sum(range(1, size + 1))}' in content
@@ -0,0 +1,129 @@
+"""
+Действия API укладываются в свои бюджеты запросов (query_budgets).
+
+Превышение бюджета роняет тест через фикстуру query_budgets. Тесты
+транзакционные: обработчики on_commit, в том числе обработка картинки
+при IMAGE_VARIANT_WORKERS = 0, выполняются внутри запроса и входят
+в его счёт, как на сервере.
+"""
+import pytest
+from django.core.cache import cache
+
+from api.views import RecipeViewSet
+from recipes.models import FavoriteRecipeUser, ShoppingCartUser
+from users.models import Follow
+
+from .conftest import create_user, recipe_payload
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def cold(method, *args, **kwargs):
+    cache.clear()
+    return method(*args, **kwargs)
+
+
+def fill_carts(recipe, users=3):
+    for number in range(users):
+        reader = create_user(f'reader{number}')
+        FavoriteRecipeUser.objects.create(user=reader, recipe=recipe)
+        ShoppingCartUser.objects.create(user=reader, recipe=recipe)
+
+
+@pytest.mark.parametrize('followers', [0, 3])
+def test_create_recipe(followers, user, user_client, tags, ingredients):
+    for number in range(followers):
+        Follow.objects.create(
+            user=create_user(f'follower{number}'), following=user)
+    response = cold(
+        user_client.post, '/api/recipes/',
+        recipe_payload(tags, ingredients), format='json')
+    assert response.status_code == 201
+
+
+@pytest.mark.parametrize('method, image', [
+    ('put', True),
+    ('patch', True),
+    ('patch', False),
+])
+def test_update_recipe(method, image, author, author_client, tags,
+                       ingredients, make_recipes):
+    recipe = make_recipes(1, recipe_author=author)[0]
+    fill_carts(recipe)
+    payload = recipe_payload(tags[:1], ingredients[1:], image=image)
+    response = cold(
+        getattr(author_client, method), f'/api/recipes/{recipe.pk}/', payload,
+        format='json')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('readers', [1, 5])
+def test_destroy_recipe_in_carts(readers, author, author_client,
+                                 make_recipes):
+    recipe = make_recipes(1, recipe_author=author)[0]
+    fill_carts(recipe, readers)
+    response = cold(author_client.delete, f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == 204
+
+
+def test_subscribe(user, user_client, author, make_recipes):
+    make_recipes(3, recipe_author=author)
+    url = f'/api/users/{author.pk}/subscribe/?recipes_limit=2'
+    assert cold(user_client.post, url).status_code == 201
+    assert cold(user_client.delete, url).status_code == 204
+    assert not Follow.objects.filter(user=user).exists()
+
+
+@pytest.mark.parametrize('action', ['favorite', 'shopping_cart'])
+def test_user_relations(action, user_client, make_recipes):
+    recipe = make_recipes(2)[0]
+    url = f'/api/recipes/{recipe.pk}/{action}/'
+    assert cold(user_client.post, url).status_code == 201
+    assert cold(user_client.delete, url).status_code == 204
+
+
+def test_set_password(user_client):
+    response = cold(
+        user_client.post, '/api/users/set_password/',
+        {'current_password': 'password', 'new_password': 'Nn-12345678'})
+    assert response.status_code == 204
+
+
+def test_over_budget_write_is_not_an_error(user_client, make_recipes,
+                                           monkeypatch, query_budgets):
+    monkeypatch.setattr(RecipeViewSet, 'query_budgets', {'favorite': 0})
+    recipe = make_recipes(1)[0]
+    response = user_client.post(f'/api/recipes/{recipe.pk}/favorite/')
+    assert response.status_code == 201
+    assert FavoriteRecipeUser.objects.filter(recipe=recipe).exists()
+    assert len(query_budgets) == 1
+    query_budgets.clear()
+
+
+def test_streaming_queries_are_counted(user, user_client, make_recipes,
+                                       monkeypatch, query_budgets):
+    for recipe in make_recipes(2):
+        ShoppingCartUser.objects.create(user=user, recipe=recipe)
+    monkeypatch.setattr(
+        RecipeViewSet, 'query_budgets', {'download_shopping_cart': 0})
+    response = cold(user_client.get, '/api/recipes/download_shopping_cart/')
+    assert response.status_code == 200
+    assert not query_budgets
+    b''.join(response.streaming_content)
+    assert query_budgets == [
+        'GET /api/recipes/download_shopping_cart/ '
+        '(RecipeViewSet.download_shopping_cart): '
+        '2 запросов к БД при бюджете 1'
+    ]
+    query_budgets.clear()
+
+
+@pytest.mark.parametrize('shared_cache', [True, False])
+def test_reads(shared_cache, settings, user, user_client, tags, ingredients):
+    settings.SHARED_CACHE = shared_cache
+    for url in ('/api/tags/', f'/api/tags/{tags[0].pk}/',
+                '/api/ingredients/?name=му',
+                f'/api/ingredients/{ingredients[0].pk}/',
+                '/api/users/?limit=6', f'/api/users/{user.pk}/',
+                '/api/users/me/'):
+        assert cold(user_client.get, url).status_code == 200
@@ -0,0 +1,170 @@
+import csv
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import RecipeIngredient, ShoppingCartUser, ShoppingListItem
+
+from .conftest import create_user
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient__name', 'total_amount'))
+
+
+def count_queries(func):
+    with CaptureQueriesContext(connection) as context:
+        func()
+    return len(context.captured_queries)
+
+
+def test_recipe_deletion_updates_shopping_lists_at_once(make_recipes):
+    small, large, kept = make_recipes(3)
+    readers = [create_user(f'reader{number}') for number in range(5)]
+    ShoppingCartUser.objects.create(user=readers[0], recipe=small)
+    for reader in readers:
+        ShoppingCartUser.objects.create(user=reader, recipe=large)
+        ShoppingCartUser.objects.create(user=reader, recipe=kept)
+    assert count_queries(small.delete) == count_queries(large.delete)
+    for reader in readers:
+        assert shopping_list(reader) == dict.fromkeys(
+            ('мука', 'сахар', 'соль', 'масло'), 3)
+
+
+def test_user_deletion_keeps_other_shopping_lists(user, make_recipes):
+    recipe = make_recipes(1)[0]
+    other = create_user('other')
+    for reader in (user, other):
+        ShoppingCartUser.objects.create(user=reader, recipe=recipe)
+    user.delete()
+    assert shopping_list(other)['мука'] == 1
+
+
+def test_rebuild_shopping_lists(user, make_recipes):
+    for recipe in make_recipes(2):
+        ShoppingCartUser.objects.create(user=user, recipe=recipe)
+    expected = shopping_list(user)
+    ShoppingListItem.objects.filter(ingredient__name='соль').delete()
+    ShoppingListItem.objects.update(total_amount=100)
+    call_command('rebuild_shopping_lists', stdout=StringIO())
+    assert shopping_list(user) == expected
+    call_command('rebuild_shopping_lists', verify=True, stdout=StringIO())
+
+
+@pytest.fixture
+def recipe_in_cart(user, make_recipes):
+    recipe = make_recipes(1)[0]
+    ShoppingCartUser.objects.create(user=user, recipe=recipe)
+    return recipe
+
+
+def inline_data(recipe, rows):
+    data = {
+        'author': recipe.author_id,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'recipe_tags-TOTAL_FORMS': 0,
+        'recipe_tags-INITIAL_FORMS': 0,
+        'ingredient_in_recipe-TOTAL_FORMS': len(rows),
+        'ingredient_in_recipe-INITIAL_FORMS': len(rows),
+    }
+    for number, (row, amount, delete) in enumerate(rows):
+        prefix = f'ingredient_in_recipe-{number}-'
+        data.update({
+            f'{prefix}id': row.pk,
+            f'{prefix}recipe': recipe.pk,
+            f'{prefix}ingredient': row.ingredient_id,
+            f'{prefix}amount': amount,
+        })
+        if delete:
+            data[f'{prefix}DELETE'] = 'on'
+    return data
+
+
+def test_admin_inline_updates_shopping_list(
+        admin_client, user, recipe_in_cart):
+    rows = list(RecipeIngredient.objects.filter(
+        recipe=recipe_in_cart).order_by('ingredient__name'))
+    response = admin_client.post(
+        f'/admin/recipes/recipe/{recipe_in_cart.pk}/change/',
+        inline_data(recipe_in_cart, [
+            (rows[0], 7, False),
+            (rows[1], 1, True),
+            (rows[2], 1, False),
+            (rows[3], 1, False),
+        ]),
+    )
+    assert response.status_code == 302
+    assert shopping_list(user) == {'масло': 7, 'соль': 1, 'сахар': 1}
+
+
+def test_admin_ingredient_row_updates_shopping_list(
+        admin_client, user, recipe_in_cart, make_recipes):
+    other = make_recipes(1)[0]
+    RecipeIngredient.objects.filter(
+        recipe=other, ingredient__name='соль').delete()
+    ShoppingCartUser.objects.create(user=user, recipe=other)
+    row = RecipeIngredient.objects.get(
+        recipe=recipe_in_cart, ingredient__name='соль')
+    response = admin_client.post(
+        f'/admin/recipes/recipeingredient/{row.pk}/change/',
+        {'recipe': other.pk, 'ingredient': row.ingredient_id, 'amount': 5},
+    )
+    assert response.status_code == 302
+    assert shopping_list(user) == {
+        'мука': 2, 'сахар': 2, 'масло': 2, 'соль': 5}
+    admin_client.post(
+        f'/admin/recipes/recipeingredient/{row.pk}/delete/', {'post': 'yes'})
+    assert 'соль' not in shopping_list(user)
+
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+@pytest.fixture
+def cart(user, make_recipes):
+    """Два рецепта в корзине, каждого ингредиента в них 1 и 2."""
+    for recipe in make_recipes(2):
+        ShoppingCartUser.objects.create(user=user, recipe=recipe)
+
+
+def download(client, file_format):
+    response = client.get(DOWNLOAD_URL, {'format': file_format})
+    assert response.status_code == 200
+    assert response['Content-Disposition'] == (
+        f'attachment; filename=my_shopping_cart.{file_format}')
+    return response, b''.join(response.streaming_content).decode()
+
+
+def test_download_csv(user_client, cart):
+    response, content = download(user_client, 'csv')
+    assert response['Content-Type'] == 'text/csv; charset=utf-8'
+    rows = list(csv.reader(StringIO(content)))
+    assert rows == [['Ингредиент', 'Единица измерения', 'Количество']] + [
+        [name, 'г', '3'] for name in ('масло', 'мука', 'сахар', 'соль')
+    ]
+
+
+def test_download_json(user_client, cart):
+    response, content = download(user_client, 'json')
+    assert response['Content-Type'] == 'application/json'
+    assert json.loads(content) == [
+        {'name': name, 'measurement_unit': 'г', 'total_amount': 3}
+        for name in ('масло', 'мука', 'сахар', 'соль')
+    ]
+
+
+def test_download_empty_json(user_client):
+    assert json.loads(download(user_client, 'json')[1]) == []
+
+
+def test_download_unknown_format(user_client, cart):
+    response = user_client.get(DOWNLOAD_URL, {'format': 'xml'})
+    assert response.status_code == 400
+    assert 'format' in response.json()